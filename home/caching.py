@@ -0,0 +1,91 @@
+"""
+Caching for tenant homepages
+Resolved PageContent and rendered pages are cached per tenant and versioned by
+PageContent.updated_at / Tenant.updated_at; signals in home.signals invalidate them.
+Invalidation only reaches other workers through a shared cache (REDIS_URL); with a
+per-process cache HOMEPAGE_CACHE_TIMEOUT bounds how long they serve an old page.
+"""
+import hashlib
+from typing import Optional, Tuple
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import F, Q
+
+from .models import PageContent
+
+HOMEPAGE_CACHE_TIMEOUT = getattr(settings, 'HOMEPAGE_CACHE_TIMEOUT', 3600)
+
+
+def content_cache_key(tenant_id) -> str:
+    return f"home:content:{tenant_id or 'none'}"
+
+
+def page_cache_key(tenant, content: dict) -> str:
+    """Rendered page key; changes whenever the content or the tenant branding changes"""
+    tenant_version = tenant.updated_at.timestamp() if tenant and tenant.updated_at else 0
+    return f"home:page:{tenant.id if tenant else 'none'}:{content.get('updated_at', 0)}:{tenant_version}"
+
+
+def homepage_validators(tenant, content: dict) -> Tuple[str, Optional[int]]:
+    """
+    ETag and Last-Modified timestamp for a homepage, computed without rendering it
+    Both change whenever the page cache key does
+    """
+    etag = hashlib.md5(page_cache_key(tenant, content).encode()).hexdigest()
+    timestamps = [content.get('updated_at')]
+    if tenant and tenant.updated_at:
+        timestamps.append(tenant.updated_at.timestamp())
+    timestamps = [ts for ts in timestamps if ts]
+    # HTTP dates have one-second resolution
+    return f'"{etag}"', int(max(timestamps)) if timestamps else None
+
+
+def homepage_content_queryset(tenant_id):
+    """
+    Active content for a tenant plus the global fallback, tenant rows first
+    A single query served by home_pagecontent_lookup_idx
+    """
+    if tenant_id is None:
+        return PageContent.objects.filter(tenant__isnull=True, is_active=True).order_by('-updated_at')
+    return PageContent.objects.filter(
+        Q(tenant_id=tenant_id) | Q(tenant__isnull=True), is_active=True
+    ).order_by(F('tenant').asc(nulls_last=True), '-updated_at')
+
+
+async def aget_homepage_content(tenant) -> dict:
+    """
+    Title, message and updated_at of the PageContent shown to tenant
+    Returns an empty dict when neither tenant nor global content exists
+    """
+    key = content_cache_key(tenant.id if tenant else None)
+    content = await cache.aget(key)
+    if content is not None:
+        return content
+
+    # Tenant-specific content wins, global content is the fallback
+    page_content = await homepage_content_queryset(tenant.id if tenant else None).afirst()
+
+    content = {}
+    if page_content:
+        content = {
+            'title': page_content.title,
+            'message': page_content.message,
+            'updated_at': page_content.updated_at.timestamp(),
+        }
+    await cache.aset(key, content, HOMEPAGE_CACHE_TIMEOUT)
+    return content
+
+
+def invalidate_tenant_homepage(tenant_id) -> None:
+    """Forget the cached content of one tenant; its old page keys simply expire"""
+    cache.delete(content_cache_key(tenant_id))
+
+
+def invalidate_all_homepages() -> None:
+    """Forget every tenant's cached content, e.g. after global content changed"""
+    from tenants.models import Tenant
+
+    keys = [content_cache_key(tenant_id) for tenant_id in Tenant.objects.values_list('id', flat=True)]
+    keys.append(content_cache_key(None))
+    cache.delete_many(keys)
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-16 22:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('home', '0002_pagecontent_tenant'),
+        ('tenants', '0003_tenanthost'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='pagecontent',
+            index=models.Index(fields=['tenant', 'is_active', '-updated_at'], name='home_pagecontent_lookup_idx'),
+        ),
+    ]
@@ -15,6 +15,10 @@ class PageContent(models.Model):
         verbose_name = "Page Content"
         verbose_name_plural = "Page Contents"
         ordering = ['-updated_at']
+        indexes = [
+            # Covers the homepage lookup: tenant (or NULL) + active, newest first
+            models.Index(fields=['tenant', 'is_active', '-updated_at'], name='home_pagecontent_lookup_idx'),
+        ]
 
     def __str__(self):
         tenant_name = self.tenant.name if self.tenant else "Global"
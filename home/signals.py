@@ -0,0 +1,25 @@
+"""
+Signal handlers that invalidate cached tenant homepages
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from tenants.models import Tenant
+
+from .caching import invalidate_all_homepages, invalidate_tenant_homepage
+from .models import PageContent
+
+
+@receiver([post_save, post_delete], sender=PageContent)
+def invalidate_page_content(sender, instance, **kwargs):
+    """Tenant content affects one homepage; global content is the fallback for all of them"""
+    if instance.tenant_id:
+        invalidate_tenant_homepage(instance.tenant_id)
+    else:
+        invalidate_all_homepages()
+
+
+@receiver([post_save, post_delete], sender=Tenant)
+def invalidate_tenant_branding(sender, instance, **kwargs):
+    """Branding is part of the rendered page and of the no-content fallback"""
+    invalidate_tenant_homepage(instance.pk)
@@ -1,3 +1,54 @@
+from unittest import skipUnless
+
+from django.core.cache import cache
+from django.db import connection
 from django.test import TestCase
 
-# Create your tests here.
+from tenants.models import Tenant
+from .caching import homepage_content_queryset
+from .models import PageContent
+
+
+class HomepageContentQueryTests(TestCase):
+    """Tenant-or-global PageContent resolution used by the homepage"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.tenant = Tenant.objects.create(name='Acme', slug='acme', domain='acme.localhost')
+        cls.other = Tenant.objects.create(name='Other', slug='other', domain='other.localhost')
+        cls.global_content = PageContent.objects.create(title='Global', message='Shared')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_tenant_content_wins_over_newer_global_content(self):
+        tenant_content = PageContent.objects.create(tenant=self.tenant, title='Acme', message='Own')
+        PageContent.objects.create(title='Newer global', message='Shared')
+
+        with self.assertNumQueries(1):
+            self.assertEqual(homepage_content_queryset(self.tenant.id).first(), tenant_content)
+
+    def test_falls_back_to_global_content(self):
+        PageContent.objects.create(tenant=self.tenant, title='Inactive', message='Own', is_active=False)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(homepage_content_queryset(self.tenant.id).first(), self.global_content)
+
+    def test_ignores_other_tenants(self):
+        PageContent.objects.create(tenant=self.other, title='Other', message='Not ours')
+
+        self.assertEqual(homepage_content_queryset(self.tenant.id).first(), self.global_content)
+
+    @skipUnless(connection.vendor == 'postgresql', 'Query plans are only checked on PostgreSQL')
+    def test_lookup_uses_covering_index(self):
+        PageContent.objects.bulk_create([
+            PageContent(tenant=self.other, title=f'Filler {i}', message='Filler')
+            for i in range(200)
+        ])
+        with connection.cursor() as cursor:
+            # Keep the planner from preferring a sequential scan on a tiny test table
+            cursor.execute('SET LOCAL enable_seqscan = off')
+            cursor.execute('ANALYZE home_pagecontent')
+
+        plan = homepage_content_queryset(self.tenant.id)[:1].explain()
+        self.assertIn('home_pagecontent_lookup_idx', plan)
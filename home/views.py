@@ -1,31 +1,45 @@
-from django.shortcuts import render
 from django.http import HttpResponse
-from .models import PageContent
+from django.shortcuts import render
+from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date
+from .caching import HOMEPAGE_CACHE_TIMEOUT, aget_homepage_content, homepage_validators, page_cache_key
 import django
 
-def home(request):
-    """Homepage view with tenant-aware dynamic content"""
+async def home(request):
+    """
+    Homepage view with tenant-aware dynamic content
+    Async so ASGI workers serve it without a thread hop per request.
+    The page does not vary by user, so GET/HEAD responses come from a per-tenant
+    page cache and warm homepages are served without touching the database.
+    Repeat visits are answered with 304 before any rendering happens.
+    """
     tenant = getattr(request, 'tenant', None)
+    cacheable = request.method in ('GET', 'HEAD')
+    cache_key = None
+    validators = None
     
     try:
-        # Get tenant-specific content first, then fall back to global content
-        page_content = None
+        content = await aget_homepage_content(tenant)
         
-        if tenant:
-            # Try to get tenant-specific content
-            page_content = PageContent.objects.filter(
-                tenant=tenant, is_active=True
-            ).first()
+        # Answer If-None-Match / If-Modified-Since from the content version alone
+        validators = homepage_validators(tenant, content)
+        if cacheable:
+            etag, last_modified = validators
+            response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+            if response is not None:
+                return set_validators(response, validators)
         
-        # If no tenant-specific content, try global content
-        if not page_content:
-            page_content = PageContent.objects.filter(
-                tenant=None, is_active=True
-            ).first()
+        # Serve the rendered page from cache while content and branding are unchanged
+        cache_key = page_cache_key(tenant, content)
+        cached = await cache.aget(cache_key) if cacheable else None
+        if cached is not None:
+            response = HttpResponse(cached['content'], content_type=cached['content_type'])
+            return set_validators(response, validators)
         
-        if page_content:
-            title = page_content.title
-            message = page_content.message
+        if content:
+            title = content['title']
+            message = content['message']
         else:
             # Use tenant branding if available
             if tenant:
@@ -39,9 +53,28 @@ def home(request):
         title = "Welcome to My Django Project"
         message = "This is your custom homepage!"
     
-    return render(request, 'home/index.html', {
+    response = render(request, 'home/index.html', {
         'title': title,
         'message': message,
         'tenant': tenant,
         'django_version': django.get_version()
     })
+    
+    if cacheable and cache_key:
+        await cache.aset(cache_key, {
+            'content': response.content,
+            'content_type': response['Content-Type'],
+        }, HOMEPAGE_CACHE_TIMEOUT)
+    if validators:
+        set_validators(response, validators)
+    return response
+
+
+def set_validators(response, validators):
+    """Attach ETag/Last-Modified and make browsers and proxies revalidate instead of re-downloading"""
+    etag, last_modified = validators
+    response['ETag'] = etag
+    if last_modified:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, public=True, no_cache=True)
+    return response
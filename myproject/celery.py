@@ -0,0 +1,15 @@
+"""
+Celery application for background jobs (AI website generation)
+Start a worker with: celery -A myproject worker -l info
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'myproject.settings')
+
+app = Celery('myproject')
+
+# Settings prefixed with CELERY_ in myproject/settings.py
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
@@ -63,6 +63,7 @@ INSTALLED_APPS = [
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',  # Static files for production
+    'website_builder.middleware.PublishedSiteMiddleware',  # Published websites on their own domains
     'django.contrib.sessions.middleware.SessionMiddleware',  # Must come before tenant middleware
     'tenants.middleware.TenantMiddleware',  # Tenant detection after session is available
     'django.middleware.common.CommonMiddleware',
@@ -84,12 +85,22 @@ TEMPLATES = [
                 'django.template.context_processors.request',
                 'django.contrib.auth.context_processors.auth',
                 'django.contrib.messages.context_processors.messages',
+                'tenants.context_processors.tenant',
             ],
         },
     },
 ]
 
 WSGI_APPLICATION = 'myproject.wsgi.application'
+ASGI_APPLICATION = 'myproject.asgi.application'  # HTTP, live preview WebSockets and generation event streams (see Procfile)
+
+# Channel layer for live preview groups. The in-memory layer only reaches sockets served
+# by the same process, so with REDIS_URL (below) the Redis layer is used instead.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
 
 
 # Database
@@ -171,6 +182,75 @@ ALLOWED_HOSTS = ['*']
 # Custom tenant settings
 DEFAULT_TENANT = 'public'
 
+# Per-worker host -> tenant resolution cache (see tenants/resolution.py)
+TENANT_RESOLUTION_CACHE_SIZE = 1024  # Max hosts kept per worker
+TENANT_RESOLUTION_CACHE_TTL = 300  # Seconds before a cached host is re-checked (safe to raise when the invalidation bus is on)
+TENANT_NEGATIVE_CACHE_SIZE = 10000  # Max unknown hosts remembered per worker
+TENANT_NEGATIVE_CACHE_TTL = 30  # Seconds an unknown host is rejected without a query
+TENANT_UNKNOWN_HOST_LOG_INTERVAL = 60  # Seconds between aggregated unknown-host warnings
+TENANT_REJECT_UNKNOWN_HOSTS = not DEBUG  # Answer 404 for hosts with no tenant instead of serving the default site
+# Hosts of the builder itself, never rejected as unknown (patterns as in ALLOWED_HOSTS)
+TENANT_PLATFORM_HOSTS = ['justcodeworks.eu', 'www.justcodeworks.eu']
+if 'RENDER_EXTERNAL_HOSTNAME' in os.environ:
+    TENANT_PLATFORM_HOSTS.append(os.environ['RENDER_EXTERNAL_HOSTNAME'])
+
+# Cache shared by every worker, Celery worker and management command. Invalidation
+# deletes keys, so it only reaches every process through a shared cache; without
+# REDIS_URL each process has its own LocMemCache and the timeouts below stay short.
+REDIS_URL = os.environ.get('REDIS_URL')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+SHARED_CACHE = bool(REDIS_URL)
+if REDIS_URL:
+    # Preview groups span every web worker process (see Procfile)
+    CHANNEL_LAYERS = {
+        'default': {
+            'BACKEND': 'channels_redis.core.RedisChannelLayer',
+            'CONFIG': {'hosts': [REDIS_URL]},
+        },
+    }
+
+# Rendered tenant homepages (see home/caching.py); invalidated by signals on change
+HOMEPAGE_CACHE_TIMEOUT = 3600 if SHARED_CACHE else 60
+
+# Compiled manifests of published websites (see website_builder/serving.py); invalidated by signals on change
+SITE_MANIFEST_CACHE_TIMEOUT = 86400 if SHARED_CACHE else 60  # Bounds staleness on other workers without a shared cache
+SITE_MANIFEST_MISS_TIMEOUT = 60  # Seconds a host without a published site is remembered
+SITE_BLOCK_CACHE_TIMEOUT = 604800  # Rendered block fragments, keyed by a hash of the block JSON
+SITE_PREVIEW_FRAGMENT_TIMEOUT = 300  # Fragments rendered for live preview edits, most of which are never saved
+
+# Pre-rendered published websites (see website_builder/publishing.py)
+PUBLISHED_SITES_LOCATION = 'published_sites'  # Directory in the default storage, shared by every instance
+PUBLISHED_SITES_KEEP_VERSIONS = 2  # Versions kept per site; the previous one covers workers with a stale manifest
+# Internal nginx location aliased to MEDIA_ROOT / PUBLISHED_SITES_LOCATION, e.g. '/_published/'; None streams files from Django
+PUBLISHED_SITES_ACCEL_REDIRECT = os.environ.get('PUBLISHED_SITES_ACCEL_REDIRECT')
+
+# Edge caching of published websites (see website_builder/purging.py)
+SITE_EDGE_MAX_AGE = 2592000  # s-maxage; changes are purged by surrogate key
+SITE_BROWSER_MAX_AGE = 60
+SITE_SURROGATE_KEY_HEADER = 'Surrogate-Key'  # e.g. 'Cache-Tag' for Cloudflare
+SITE_PURGE_BACKEND = os.environ.get('SITE_PURGE_BACKEND', 'website_builder.purging.NullPurgeBackend')
+SITE_PURGE_URL = os.environ.get('SITE_PURGE_URL')  # HttpPurgeBackend target; /build/api/purge/ is a local stand-in
+SITE_PURGE_TOKEN = os.environ.get('SITE_PURGE_TOKEN')
+SITE_PURGE_TIMEOUT = 1  # Seconds; purges run on Celery when a broker is configured, else inline after commit
+
+# Editor revision history (see website_builder/history.py); compacted by compact_content_revisions
+CONTENT_REVISION_SNAPSHOT_EVERY = 25  # Max deltas between full snapshots
+CONTENT_REVISION_KEEP_LATEST = 50  # Newest revisions kept per page
+CONTENT_REVISION_RETENTION_DAYS = 30  # Older revisions keep one snapshot per day for this long
+
+# Editor autosave buffer (see website_builder/autosave.py); needs a cache shared by all workers
+AUTOSAVE_FLUSH_INTERVAL = 30 if SHARED_CACHE else 0  # Max seconds a buffered edit waits before it is written; 0 writes through
+AUTOSAVE_BUFFER_TIMEOUT = 86400  # Seconds an unflushed buffer survives in the cache
+
+# Redis used to broadcast tenant/domain changes to every worker (None = local-only invalidation)
+TENANT_INVALIDATION_REDIS_URL = REDIS_URL
+
 # Domain Registration API Configuration
 # Using OpenProvider (https://www.openprovider.com/) as domain registrar
 DOMAIN_REGISTRAR_API_URL = 'https://api.openprovider.eu/v1beta'
@@ -181,6 +261,22 @@ DOMAIN_REGISTRAR_PROVIDER = 'openprovider'
 # Website Builder Configuration
 OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
 
+# Background AI generation (see website_builder/jobs.py): 'celery', 'thread' or 'sync'.
+# Threads die with their web worker, so outside DEBUG jobs always go to Celery (the
+# worker process in the Procfile); without a broker they fail instead of hanging.
+CELERY_BROKER_URL = os.environ.get('CELERY_BROKER_URL', REDIS_URL)
+GENERATION_JOB_BACKEND = os.environ.get('GENERATION_JOB_BACKEND', 'celery' if CELERY_BROKER_URL or not DEBUG else 'thread')
+CELERY_TASK_ACKS_LATE = True  # A job survives a worker crash mid-generation
+CELERY_TASK_TIME_LIMIT = 300  # Seconds before a stuck LLM call is killed
+CELERY_WORKER_PREFETCH_MULTIPLIER = 1  # Generation tasks are long; don't hoard them
+GENERATION_JOB_TIMEOUT = 600  # Seconds before a queued or running job is marked failed (fail_stale_generation_jobs)
+# Stream pages and blocks to the waiting page as the model writes them (served over
+# ASGI only). The event log lives in the default cache, which must be shared (Redis)
+# when jobs run on Celery; otherwise the stream only reports the job's outcome
+GENERATION_STREAMING = SHARED_CACHE or GENERATION_JOB_BACKEND != 'celery'
+GENERATION_EVENTS_TIMEOUT = 3600  # Seconds an event log is kept for reconnecting clients
+GENERATION_STREAM_TIMEOUT = 300  # Seconds before an event stream gives up on a job
+
 # Payment Processing (Stripe)
 STRIPE_PUBLIC_KEY = os.environ.get('STRIPE_PUBLIC_KEY')
 STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
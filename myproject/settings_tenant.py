@@ -75,6 +75,10 @@ CACHES = {
     }
 }
 
+# Broadcast tenant routing invalidations over the same Redis instance
+if 'redis' in CACHES['default']['BACKEND'].lower():
+    TENANT_INVALIDATION_REDIS_URL = CACHES['default']['LOCATION']
+
 # Logging configuration
 LOGGING = {
     'version': 1,
@@ -117,6 +121,7 @@ if not DEBUG:
         'LOCATION': os.environ.get('REDIS_URL', 'redis://127.0.0.1:6379/1'),
         'KEY_PREFIX': 'tenant',
     }
+    TENANT_INVALIDATION_REDIS_URL = CACHES['default']['LOCATION']
     
     # Update base domain for production
     TENANT_BASE_DOMAIN = os.environ.get('TENANT_BASE_DOMAIN', 'jcwtradehub.com')
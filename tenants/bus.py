@@ -0,0 +1,115 @@
+"""
+Cross-worker invalidation bus for the tenant routing caches
+Broadcasts tenant/domain changes over Redis pub/sub so every worker evicts stale hosts
+"""
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from typing import Iterable, Optional
+
+from django.conf import settings
+
+from .resolution import negative_cache, resolution_cache
+
+logger = logging.getLogger(__name__)
+
+
+def apply_invalidation(tenant_id: Optional[int] = None, hosts: Iterable[str] = (), clear: bool = False) -> None:
+    """Evict the local cache entries affected by a tenant or domain change"""
+    if clear:
+        resolution_cache.clear()
+    elif tenant_id is not None:
+        resolution_cache.evict_tenant(tenant_id)
+    resolution_cache.evict_hosts(hosts)
+    # A new domain or slug may now match hosts that were cached as unknown
+    negative_cache.clear()
+
+
+class InvalidationBus:
+    """
+    Redis pub/sub channel shared by all workers
+    Without a Redis URL it degrades to local-only invalidation
+    """
+
+    def __init__(self, url: Optional[str], channel: str = 'tenants:invalidate'):
+        self.url = url
+        self.channel = channel
+        self._client = None
+        self._listener = None
+        self._pid = None
+        self._origin = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.url)
+
+    @property
+    def origin(self) -> str:
+        """Identifies this worker so it can skip its own messages (regenerated after fork)"""
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            self._origin = uuid.uuid4().hex
+            self._client = None
+            self._listener = None
+        return self._origin
+
+    def _get_client(self):
+        if self._client is None:
+            import redis
+            self._client = redis.Redis.from_url(self.url)
+        return self._client
+
+    def publish(self, tenant_id: Optional[int] = None, hosts: Iterable[str] = (), clear: bool = False) -> None:
+        """Apply an invalidation locally and broadcast it to the other workers"""
+        hosts = [host.lower() for host in hosts if host]
+        apply_invalidation(tenant_id, hosts, clear)
+        if not self.enabled:
+            return
+
+        message = json.dumps({'origin': self.origin, 'tenant_id': tenant_id, 'hosts': hosts, 'clear': clear})
+        try:
+            self._get_client().publish(self.channel, message)
+        except Exception as e:
+            logger.error(f"Could not publish tenant invalidation: {e}")
+
+    def start(self) -> None:
+        """Start this worker's subscriber thread once; safe to call repeatedly"""
+        if not self.enabled:
+            return
+        with self._lock:
+            origin = self.origin
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(
+                target=self._listen, args=(origin,), name='tenant-invalidation', daemon=True
+            )
+            self._listener.start()
+
+    def _listen(self, origin: str) -> None:
+        backoff = 1
+        while True:
+            try:
+                pubsub = self._get_client().pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(self.channel)
+                # Events may have been missed while disconnected
+                resolution_cache.clear()
+                negative_cache.clear()
+                backoff = 1
+                for message in pubsub.listen():
+                    event = json.loads(message['data'])
+                    if event.get('origin') == origin:
+                        continue
+                    apply_invalidation(event.get('tenant_id'), event.get('hosts', []), event.get('clear', False))
+            except Exception as e:
+                logger.warning(f"Tenant invalidation listener disconnected: {e}")
+                resolution_cache.clear()
+                negative_cache.clear()
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 30)
+
+
+invalidation_bus = InvalidationBus(getattr(settings, 'TENANT_INVALIDATION_REDIS_URL', None))
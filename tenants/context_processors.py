@@ -0,0 +1,20 @@
+"""
+Template context for the tenant resolved by TenantMiddleware
+"""
+
+
+def tenant(request):
+    """
+    Expose the current tenant and its branding to templates
+    Reads the request-scoped snapshot, so rendering never touches the session or the database
+    """
+    current = getattr(request, 'tenant', None)
+    if current is None:
+        return {'tenant': None}
+    return {
+        'tenant': current,
+        'tenant_name': current.name,
+        'tenant_domain': current.domain,
+        'site_title': current.site_title,
+        'site_tagline': current.site_tagline,
+    }
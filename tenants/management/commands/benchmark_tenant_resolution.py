@@ -0,0 +1,87 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from tenants.models import Tenant, TenantDomain, TenantHost
+
+
+class Rollback(Exception):
+    """Raised to discard the synthetic tenants once the benchmark is done"""
+
+
+def legacy_lookup(host):
+    """The three-query lookup TenantMiddleware used before the host index"""
+    tenant = Tenant.objects.filter(domain=host, is_active=True).first()
+    if not tenant:
+        tenant_domain = TenantDomain.objects.filter(
+            domain=host, is_active=True
+        ).select_related('tenant').first()
+        if tenant_domain:
+            tenant = tenant_domain.tenant
+    if not tenant and '.' in host and not host.startswith('www.'):
+        tenant = Tenant.objects.filter(slug=host.split('.')[0], is_active=True).first()
+    return tenant
+
+
+def indexed_lookup(host):
+    entry = TenantHost.objects.resolve(host)
+    return entry.tenant if entry else None
+
+
+class Command(BaseCommand):
+    help = 'Compare legacy and indexed tenant host resolution on synthetic hosts'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hosts', type=int, default=100000, help='Number of hosts to resolve')
+        parser.add_argument('--tenants', type=int, default=1000, help='Number of synthetic tenants')
+        parser.add_argument('--seed', type=int, default=42, help='Random seed for the host mix')
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        try:
+            with transaction.atomic():
+                hosts = self._create_tenants(options['tenants'], options['hosts'], rng)
+                self.stdout.write(f'Resolving {len(hosts)} hosts against {options["tenants"]} tenants...')
+
+                legacy = self._run('legacy (3 queries)', legacy_lookup, hosts)
+                indexed = self._run('indexed (1 query)', indexed_lookup, hosts)
+                if legacy[1] != indexed[1]:
+                    self.stdout.write(self.style.ERROR('Lookups disagree - check the host index'))
+
+                self.stdout.write(
+                    self.style.SUCCESS(f'✓ Speedup: {legacy[0] / indexed[0]:.2f}x')
+                )
+                raise Rollback
+        except Rollback:
+            pass
+
+    def _create_tenants(self, tenant_count, host_count, rng):
+        """Create synthetic tenants and return a host mix covering every match type"""
+        tenants = Tenant.objects.bulk_create([
+            Tenant(name=f'Bench Tenant {i}', slug=f'bench{i}', domain=f'bench{i}.example.com')
+            for i in range(tenant_count)
+        ])
+        domains = TenantDomain.objects.bulk_create([
+            TenantDomain(tenant=tenant, domain=f'www.bench-alias{i}.example.org')
+            for i, tenant in enumerate(tenants)
+        ])
+        # bulk_create skips signals, so build the index the same way the command does
+        TenantHost.objects.rebuild()
+
+        pools = [
+            [tenant.domain for tenant in tenants],
+            [domain.domain for domain in domains],
+            [f'{tenant.slug}.tenants.example.net' for tenant in tenants],
+            [f'unknown{i}.example.invalid' for i in range(tenant_count)],
+        ]
+        return [rng.choice(rng.choice(pools)) for _ in range(host_count)]
+
+    def _run(self, label, lookup, hosts):
+        started = time.perf_counter()
+        resolved = [getattr(lookup(host), 'pk', None) for host in hosts]
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f'  {label}: {elapsed:.2f}s ({elapsed / len(hosts) * 1e6:.1f} µs/host)'
+        )
+        return elapsed, resolved
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from tenants.models import TenantHost
+from tenants.bus import invalidation_bus
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the TenantHost lookup index from Tenant and TenantDomain'
+
+    def handle(self, *args, **options):
+        count = TenantHost.objects.rebuild()
+        invalidation_bus.publish(clear=True)
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Rebuilt tenant host index ({count} entries)')
+        )
@@ -1,67 +1,130 @@
-from django.utils.deprecation import MiddlewareMixin
-from .models import Tenant, TenantDomain
+from collections import Counter
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponseNotFound
+from django.http.request import validate_host
+from .bus import invalidation_bus
+from .resolution import DEVELOPMENT_HOSTS, aresolve_host, resolve_host
 import logging
+import threading
+import time
 
 logger = logging.getLogger(__name__)
 
-class TenantMiddleware(MiddlewareMixin):
+
+class UnknownHostReporter:
+    """
+    Aggregates requests for unknown hosts and logs one summary per interval
+    Keeps scanner traffic from producing a warning line per request
+    """
+
+    def __init__(self, interval: float = 60, max_hosts: int = 1000, top: int = 5):
+        self.interval = interval
+        self.max_hosts = max_hosts
+        self.top = top
+        self._counts = Counter()
+        self._other = 0
+        self._window_start = time.monotonic()
+        self._lock = threading.Lock()
+
+    def record(self, host: str) -> None:
+        with self._lock:
+            if host in self._counts or len(self._counts) < self.max_hosts:
+                self._counts[host] += 1
+            else:
+                self._other += 1
+
+            elapsed = time.monotonic() - self._window_start
+            if elapsed < self.interval:
+                return
+            counts, other = self._counts, self._other
+            self._counts, self._other = Counter(), 0
+            self._window_start = time.monotonic()
+
+        total = sum(counts.values()) + other
+        hosts = f"{len(counts)}+" if other else f"{len(counts)}"
+        top_hosts = ', '.join(f"{name} x{count}" for name, count in counts.most_common(self.top))
+        logger.warning(
+            f"No tenant found for {total} requests across {hosts} hosts "
+            f"in the last {elapsed:.0f}s (top: {top_hosts})"
+        )
+
+
+unknown_host_reporter = UnknownHostReporter(
+    interval=getattr(settings, 'TENANT_UNKNOWN_HOST_LOG_INTERVAL', 60),
+)
+
+
+class TenantMiddleware:
     """
     Simple tenant middleware that identifies tenants by domain.
-    Uses MiddlewareMixin for better compatibility with Django middleware chain.
+    Supports both WSGI and ASGI: under ASGI the chain stays async and warm
+    hosts resolve from the worker cache without a thread hop.
     """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+        # Listen for tenant changes made by other workers
+        invalidation_bus.start()
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        response = self.process_request(request)
+        if response is None:
+            response = self.get_response(request)
+        return self.process_response(request, response)
+
+    async def __acall__(self, request):
+        response = await self.aprocess_request(request)
+        if response is None:
+            response = await self.get_response(request)
+        return await self.aprocess_response(request, response)
+
+    def get_request_host(self, request):
+        """Lower-cased request host without the port"""
+        host = request.get_host().lower()
+        if ':' in host:
+            host = host.split(':')[0]  # Remove port if present
+        return host
 
     def process_request(self, request):
         """Process the request to identify and set the tenant."""
-        # Get the current domain/host
-        host = request.get_host()
-        if ':' in host:
-            host = host.split(':')[0].lower()  # Remove port if present
+        host = self.get_request_host(request)
         
-        # Try to find tenant by primary domain first
+        # Resolve through the per-worker cache; only a cold host reaches the database.
+        # Development hosts fall back to the default tenant, pinned after the first hit.
         tenant = None
         try:
-            tenant = Tenant.objects.filter(domain=host, is_active=True).first()
-            
-            # If not found by primary domain, check additional domains
-            if not tenant:
-                tenant_domain = TenantDomain.objects.filter(
-                    domain=host, is_active=True
-                ).select_related('tenant').first()
-                if tenant_domain:
-                    tenant = tenant_domain.tenant
-                    
-            # If still not found, try subdomain matching
-            if not tenant and '.' in host and not host.startswith('www.'):
-                # Extract subdomain (first part before first dot)
-                subdomain = host.split('.')[0]
-                tenant = Tenant.objects.filter(
-                    slug=subdomain, is_active=True
-                ).first()
-                
+            tenant = resolve_host(host)
         except Exception as e:
             logger.error(f"Error finding tenant for host {host}: {e}")
-            
-        # Set default tenant if none found (for development)
-        if not tenant:
-            # Create or get default tenant for localhost/127.0.0.1
-            if host in ['localhost', '127.0.0.1', 'testserver']:
-                try:
-                    tenant, created = Tenant.objects.get_or_create(
-                        slug='default',
-                        defaults={
-                            'name': 'Default Tenant',
-                            'domain': 'localhost',
-                            'site_title': 'Default Site',
-                            'site_tagline': 'Development Environment',
-                            'is_active': True
-                        }
-                    )
-                    if created:
-                        logger.info("Created default tenant for development")
-                except Exception as e:
-                    logger.error(f"Error creating default tenant: {e}")
-            else:
-                logger.warning(f"No tenant found for host: {host}")
+        
+        return self.set_tenant(request, host, tenant)
+
+    async def aprocess_request(self, request):
+        """Async counterpart of process_request using the async ORM."""
+        host = self.get_request_host(request)
+        
+        tenant = None
+        try:
+            tenant = await aresolve_host(host)
+        except Exception as e:
+            logger.error(f"Error finding tenant for host {host}: {e}")
+        
+        return self.set_tenant(request, host, tenant)
+
+    def set_tenant(self, request, host, tenant):
+        """Attach the resolved tenant to the request, or reject an unknown host"""
+        if not tenant and host not in DEVELOPMENT_HOSTS and not self.is_platform_host(host):
+            unknown_host_reporter.record(host)
+            if getattr(settings, 'TENANT_REJECT_UNKNOWN_HOSTS', False):
+                return HttpResponseNotFound('Unknown host')
         
         # Store tenant in request for use in views
         request.tenant = tenant
@@ -71,23 +134,42 @@ class TenantMiddleware(MiddlewareMixin):
             logger.debug(f"Tenant detected: {tenant.name} ({tenant.domain}) for host: {host}")
         else:
             logger.debug(f"No tenant detected for host: {host}")
+        return None
+
+    @staticmethod
+    def is_platform_host(host):
+        """Hosts of the builder itself, served without a tenant (patterns as in ALLOWED_HOSTS)"""
+        return validate_host(host, getattr(settings, 'TENANT_PLATFORM_HOSTS', []))
 
     def process_response(self, request, response):
         """
-        Process the response to optionally store tenant info in session.
-        This runs after all other middleware, so session should be available.
+        Record the tenant in an existing session when it changes.
+        Templates read the tenant from tenants.context_processors.tenant instead,
+        so unchanged tenants never mark the session modified or set a cookie.
         """
-        tenant = getattr(request, 'tenant', None)
-        
-        # Store tenant info in session if available (optional - for template context)
-        if tenant and hasattr(request, 'session'):
-            try:
-                request.session['tenant_id'] = tenant.id
-                request.session['tenant_name'] = tenant.name
-                request.session['tenant_domain'] = tenant.domain
-                request.session['site_title'] = tenant.site_title
-                request.session['site_tagline'] = tenant.site_tagline
-            except Exception as e:
-                logger.debug(f"Could not store tenant info in session: {e}")
-        
-        return response
\ No newline at end of file
+        if self.has_session_to_update(request):
+            self.store_in_session(request)
+        return response
+
+    async def aprocess_response(self, request, response):
+        """Async counterpart of process_response; only existing sessions cost a thread hop."""
+        if self.has_session_to_update(request):
+            await sync_to_async(self.store_in_session)(request)
+        return response
+
+    def has_session_to_update(self, request):
+        session = getattr(request, 'session', None)
+        return bool(getattr(request, 'tenant', None) and session is not None and session.session_key)
+
+    def store_in_session(self, request):
+        tenant = request.tenant
+        session = request.session
+        try:
+            if session.get('tenant_id') != tenant.id:
+                session['tenant_id'] = tenant.id
+                session['tenant_name'] = tenant.name
+                session['tenant_domain'] = tenant.domain
+                session['site_title'] = tenant.site_title
+                session['site_tagline'] = tenant.site_tagline
+        except Exception as e:
+            logger.debug(f"Could not store tenant info in session: {e}")
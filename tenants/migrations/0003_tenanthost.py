@@ -0,0 +1,49 @@
+# Generated by Django 5.0.7 on 2026-10-16 22:33
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def populate_tenant_hosts(apps, schema_editor):
+    Tenant = apps.get_model('tenants', 'Tenant')
+    TenantDomain = apps.get_model('tenants', 'TenantDomain')
+    TenantHost = apps.get_model('tenants', 'TenantHost')
+
+    entries = []
+    for tenant in Tenant.objects.filter(is_active=True):
+        entries.append(TenantHost(host=tenant.domain.lower(), match_type=0, tenant=tenant))
+        entries.append(TenantHost(host=f"{tenant.slug.lower()}.*", match_type=2, tenant=tenant))
+    for tenant_domain in TenantDomain.objects.filter(is_active=True):
+        entries.append(TenantHost(
+            host=tenant_domain.domain.lower(),
+            match_type=1,
+            tenant_id=tenant_domain.tenant_id,
+            tenant_domain=tenant_domain,
+        ))
+    TenantHost.objects.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0002_tenant_homepage_screenshot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TenantHost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('host', models.CharField(max_length=255)),
+                ('match_type', models.PositiveSmallIntegerField(choices=[(0, 'Primary domain'), (1, 'Additional domain'), (2, 'Subdomain')])),
+                ('tenant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='hosts', to='tenants.tenant')),
+                ('tenant_domain', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='tenants.tenantdomain')),
+            ],
+            options={
+                'verbose_name': 'Tenant Host',
+                'verbose_name_plural': 'Tenant Hosts',
+                'ordering': ['host', 'match_type'],
+                'unique_together': {('host', 'match_type')},
+            },
+        ),
+        migrations.RunPython(populate_tenant_hosts, migrations.RunPython.noop),
+    ]
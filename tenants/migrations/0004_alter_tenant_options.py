@@ -0,0 +1,25 @@
+# Generated by Django 5.0.7 on 2026-10-16 22:33
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tenants', '0003_tenanthost'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='tenant',
+            options={'ordering': ['name'], 'verbose_name': 'Tenant', 'verbose_name_plural': 'Tenants'},
+        ),
+        migrations.AlterModelOptions(
+            name='tenantdomain',
+            options={'ordering': ['domain'], 'verbose_name': 'Tenant Domain', 'verbose_name_plural': 'Tenant Domains'},
+        ),
+        migrations.AlterModelOptions(
+            name='tenantuser',
+            options={'verbose_name': 'Tenant User', 'verbose_name_plural': 'Tenant Users'},
+        ),
+    ]
@@ -1,7 +1,7 @@
-from django.db import models
+from django.db import models, transaction
 from django.contrib.auth.models import User
 from django.utils.html import format_html
-from typing import Optional
+from typing import List, Optional
 
 
 class Tenant(models.Model):
@@ -87,3 +87,108 @@ class TenantUser(models.Model):
         
     def __str__(self) -> str:
         return f"{self.user.username} @ {self.tenant.name}"
+
+
+class TenantHostManager(models.Manager):
+    """Keeps the denormalized host index in sync with Tenant and TenantDomain"""
+
+    def resolve(self, host: str) -> Optional['TenantHost']:
+        """Find the best matching host entry with a single indexed query"""
+        return self._resolve_queryset(host).first()
+
+    async def aresolve(self, host: str) -> Optional['TenantHost']:
+        return await self._resolve_queryset(host).afirst()
+
+    def _resolve_queryset(self, host: str):
+        return self.filter(
+            host__in=TenantHost.candidate_hosts(host)
+        ).select_related('tenant').order_by('match_type')
+
+    def sync_tenant(self, tenant: Tenant) -> None:
+        """Rebuild the primary domain and subdomain entries of one tenant"""
+        self.filter(
+            tenant=tenant, match_type__in=[TenantHost.MATCH_DOMAIN, TenantHost.MATCH_SUBDOMAIN]
+        ).delete()
+        if tenant.is_active:
+            self.bulk_create(TenantHost.entries_for_tenant(tenant), ignore_conflicts=True)
+
+    def sync_domain(self, tenant_domain: TenantDomain) -> None:
+        """Rebuild the entry of one additional domain"""
+        self.filter(tenant_domain=tenant_domain).delete()
+        if tenant_domain.is_active:
+            self.bulk_create(TenantHost.entries_for_domain(tenant_domain), ignore_conflicts=True)
+
+    def rebuild(self) -> int:
+        """Recreate the whole index from Tenant and TenantDomain"""
+        entries = []
+        for tenant in Tenant.objects.filter(is_active=True).iterator():
+            entries.extend(TenantHost.entries_for_tenant(tenant))
+        for tenant_domain in TenantDomain.objects.filter(is_active=True).iterator():
+            entries.extend(TenantHost.entries_for_domain(tenant_domain))
+
+        with transaction.atomic():
+            self.all().delete()
+            self.bulk_create(entries, batch_size=1000, ignore_conflicts=True)
+        return len(entries)
+
+
+class TenantHost(models.Model):
+    """
+    Denormalized host index used by TenantMiddleware
+    Merges primary domains, additional domains and slug subdomains into one table
+    """
+    MATCH_DOMAIN = 0
+    MATCH_ALIAS = 1
+    MATCH_SUBDOMAIN = 2
+    MATCH_TYPES = [
+        (MATCH_DOMAIN, 'Primary domain'),
+        (MATCH_ALIAS, 'Additional domain'),
+        (MATCH_SUBDOMAIN, 'Subdomain'),
+    ]
+
+    # Subdomain entries are stored as "<slug>.*" and match any base domain
+    SUBDOMAIN_WILDCARD = '*'
+
+    host = models.CharField(max_length=255)
+    match_type = models.PositiveSmallIntegerField(choices=MATCH_TYPES)
+    tenant = models.ForeignKey(Tenant, on_delete=models.CASCADE, related_name='hosts')
+    tenant_domain = models.ForeignKey(
+        TenantDomain, on_delete=models.CASCADE, null=True, blank=True, related_name='+'
+    )
+
+    objects = TenantHostManager()
+
+    class Meta:
+        unique_together = ['host', 'match_type']
+        ordering = ['host', 'match_type']
+        verbose_name = "Tenant Host"
+        verbose_name_plural = "Tenant Hosts"
+
+    def __str__(self) -> str:
+        return f"{self.host} -> {self.tenant_id} ({self.get_match_type_display()})"
+
+    @classmethod
+    def candidate_hosts(cls, host: str) -> List[str]:
+        """Index keys that may match host, in no particular order"""
+        candidates = [host]
+        if '.' in host and not host.startswith('www.'):
+            candidates.append(f"{host.split('.')[0]}.{cls.SUBDOMAIN_WILDCARD}")
+        return candidates
+
+    @classmethod
+    def entries_for_tenant(cls, tenant: Tenant) -> List['TenantHost']:
+        return [
+            cls(host=tenant.domain.lower(), match_type=cls.MATCH_DOMAIN, tenant=tenant),
+            cls(host=f"{tenant.slug.lower()}.{cls.SUBDOMAIN_WILDCARD}", match_type=cls.MATCH_SUBDOMAIN, tenant=tenant),
+        ]
+
+    @classmethod
+    def entries_for_domain(cls, tenant_domain: TenantDomain) -> List['TenantHost']:
+        return [
+            cls(
+                host=tenant_domain.domain.lower(),
+                match_type=cls.MATCH_ALIAS,
+                tenant_id=tenant_domain.tenant_id,
+                tenant_domain=tenant_domain,
+            ),
+        ]
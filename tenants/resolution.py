@@ -0,0 +1,247 @@
+"""
+Host -> tenant resolution for TenantMiddleware
+Keeps a bounded, per-worker cache so warm hosts resolve without touching the database
+"""
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Iterable, Optional
+
+from django.conf import settings
+
+from .models import Tenant, TenantHost
+
+# Hosts served by the default tenant when nothing else matches (development, health checks)
+DEVELOPMENT_HOSTS = ['localhost', '127.0.0.1', 'testserver']
+
+DEFAULT_TENANT_SLUG = 'default'
+
+DEFAULT_TENANT_DEFAULTS = {
+    'name': 'Default Tenant',
+    'domain': 'localhost',
+    'site_title': 'Default Site',
+    'site_tagline': 'Development Environment',
+    'is_active': True
+}
+
+
+@dataclass(frozen=True)
+class TenantSnapshot:
+    """Immutable copy of the tenant fields needed while serving a request"""
+    id: int
+    name: str
+    slug: str
+    domain: str
+    site_title: str
+    site_tagline: str
+    updated_at: Optional[datetime] = None
+
+    @classmethod
+    def from_tenant(cls, tenant: Tenant) -> 'TenantSnapshot':
+        return cls(
+            id=tenant.id,
+            name=tenant.name,
+            slug=tenant.slug,
+            domain=tenant.domain,
+            site_title=tenant.site_title,
+            site_tagline=tenant.site_tagline,
+            updated_at=tenant.updated_at,
+        )
+
+    @property
+    def pk(self) -> int:
+        return self.id
+
+    def __str__(self) -> str:
+        return f"{self.name} ({self.domain})"
+
+    def get_frontend_url(self) -> str:
+        """Get the full URL to the tenant's frontend"""
+        return Tenant.get_frontend_url(self)
+
+    def get_tenant(self) -> Tenant:
+        """Load the full Tenant model for views that need more than the snapshot"""
+        return Tenant.objects.get(pk=self.id)
+
+
+class ResolutionCache:
+    """
+    Bounded LRU cache of host -> TenantSnapshot with a per-entry TTL
+    Shared by all threads of a worker process
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 300):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # host -> (expires_at, snapshot)
+        self._pinned = {}  # host -> snapshot, exempt from TTL and LRU eviction
+        self._lock = threading.Lock()
+
+    def get(self, host: str) -> Optional[TenantSnapshot]:
+        """Return the cached snapshot for host, or None on a miss"""
+        with self._lock:
+            snapshot = self._pinned.get(host)
+            if snapshot is not None:
+                return snapshot
+            entry = self._entries.get(host)
+            if entry is None:
+                return None
+            expires_at, snapshot = entry
+            if expires_at < time.monotonic():
+                del self._entries[host]
+                return None
+            self._entries.move_to_end(host)
+            return snapshot
+
+    def set(self, host: str, snapshot: TenantSnapshot) -> None:
+        with self._lock:
+            self._entries[host] = (time.monotonic() + self.ttl, snapshot)
+            self._entries.move_to_end(host)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pin(self, host: str, snapshot: TenantSnapshot) -> None:
+        """Cache host until it is explicitly invalidated"""
+        with self._lock:
+            self._pinned[host] = snapshot
+            self._entries.pop(host, None)
+
+    def evict_hosts(self, hosts: Iterable[str]) -> None:
+        with self._lock:
+            for host in hosts:
+                self._entries.pop(host.lower(), None)
+                self._pinned.pop(host.lower(), None)
+
+    def evict_tenant(self, tenant_id: int) -> None:
+        """Drop every host that currently resolves to tenant_id"""
+        with self._lock:
+            stale = [host for host, (_, snapshot) in self._entries.items() if snapshot.id == tenant_id]
+            for host in stale:
+                del self._entries[host]
+            for host in [host for host, snapshot in self._pinned.items() if snapshot.id == tenant_id]:
+                del self._pinned[host]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._pinned.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self._pinned)
+
+
+class NegativeCache:
+    """
+    Bounded set of hosts known to have no tenant, each remembered for a short TTL
+    Lets junk Host headers be rejected without a database round trip
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 30):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict()  # host -> expires_at
+        self._lock = threading.Lock()
+
+    def __contains__(self, host: str) -> bool:
+        with self._lock:
+            expires_at = self._entries.get(host)
+            if expires_at is None:
+                return False
+            if expires_at < time.monotonic():
+                del self._entries[host]
+                return False
+            return True
+
+    def add(self, host: str) -> None:
+        with self._lock:
+            self._entries[host] = time.monotonic() + self.ttl
+            self._entries.move_to_end(host)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+resolution_cache = ResolutionCache(
+    max_size=getattr(settings, 'TENANT_RESOLUTION_CACHE_SIZE', 1024),
+    ttl=getattr(settings, 'TENANT_RESOLUTION_CACHE_TTL', 300),
+)
+
+negative_cache = NegativeCache(
+    max_size=getattr(settings, 'TENANT_NEGATIVE_CACHE_SIZE', 10000),
+    ttl=getattr(settings, 'TENANT_NEGATIVE_CACHE_TTL', 30),
+)
+
+
+def lookup_tenant(host: str) -> Optional[Tenant]:
+    """Find the tenant for host with one query against the TenantHost index"""
+    entry = TenantHost.objects.resolve(host)
+    return entry.tenant if entry else None
+
+
+async def alookup_tenant(host: str) -> Optional[Tenant]:
+    """Async counterpart of lookup_tenant"""
+    entry = await TenantHost.objects.aresolve(host)
+    return entry.tenant if entry else None
+
+
+def resolve_host(host: str) -> Optional[TenantSnapshot]:
+    """Resolve host to a tenant snapshot, consulting the worker cache first"""
+    snapshot = resolution_cache.get(host)
+    if snapshot is not None:
+        return snapshot
+    if host in negative_cache:
+        return None
+
+    tenant = lookup_tenant(host)
+    if tenant is None and host in DEVELOPMENT_HOSTS:
+        tenant = Tenant.objects.filter(slug=DEFAULT_TENANT_SLUG, is_active=True).first()
+        return pin_default_tenant(host, tenant)
+    return remember(host, tenant)
+
+
+async def aresolve_host(host: str) -> Optional[TenantSnapshot]:
+    """Async counterpart of resolve_host; cache hits never leave the event loop"""
+    snapshot = resolution_cache.get(host)
+    if snapshot is not None:
+        return snapshot
+    if host in negative_cache:
+        return None
+
+    tenant = await alookup_tenant(host)
+    if tenant is None and host in DEVELOPMENT_HOSTS:
+        tenant = await Tenant.objects.filter(slug=DEFAULT_TENANT_SLUG, is_active=True).afirst()
+        return pin_default_tenant(host, tenant)
+    return remember(host, tenant)
+
+
+def remember(host: str, tenant: Optional[Tenant]) -> Optional[TenantSnapshot]:
+    """Cache a lookup result, positive or negative, and return its snapshot"""
+    if tenant is None:
+        negative_cache.add(host)
+        return None
+
+    snapshot = TenantSnapshot.from_tenant(tenant)
+    resolution_cache.set(host, snapshot)
+    return snapshot
+
+
+def pin_default_tenant(host: str, tenant: Optional[Tenant]) -> Optional[TenantSnapshot]:
+    """
+    Pin the default tenant for a development host
+    The tenant itself is provisioned at migrate time (see tenants.signals.ensure_default_tenant)
+    """
+    if tenant is None:
+        negative_cache.add(host)
+        return None
+
+    snapshot = TenantSnapshot.from_tenant(tenant)
+    resolution_cache.pin(host, snapshot)
+    return snapshot
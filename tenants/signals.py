@@ -0,0 +1,56 @@
+"""
+Signal handlers that keep tenant routing data in sync with the database
+"""
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+import logging
+
+from .bus import apply_invalidation, invalidation_bus
+from .models import Tenant, TenantDomain, TenantHost
+from .resolution import DEFAULT_TENANT_DEFAULTS, DEFAULT_TENANT_SLUG
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_default_tenant(sender, using='default', **kwargs):
+    """
+    Provision the default tenant after migrate so the request path never writes
+    Connected in TenantsConfig.ready for this app's post_migrate
+    """
+    tenant, created = Tenant.objects.using(using).get_or_create(
+        slug=DEFAULT_TENANT_SLUG, defaults=DEFAULT_TENANT_DEFAULTS
+    )
+    if created:
+        logger.info("Created default tenant for development")
+
+
+@receiver(post_save, sender=Tenant)
+def sync_tenant_hosts(sender, instance, raw=False, **kwargs):
+    """Refresh the host index entries of a saved tenant"""
+    if not raw:
+        TenantHost.objects.sync_tenant(instance)
+
+
+@receiver(post_save, sender=TenantDomain)
+def sync_domain_hosts(sender, instance, raw=False, **kwargs):
+    """Refresh the host index entry of a saved additional domain"""
+    if not raw:
+        TenantHost.objects.sync_domain(instance)
+
+
+@receiver([post_save, post_delete], sender=Tenant)
+def invalidate_tenant_resolution(sender, instance, **kwargs):
+    """Forget cached hosts for a tenant whose domain, slug or branding changed"""
+    hosts = [instance.domain]
+    apply_invalidation(instance.pk, hosts)
+    # Other workers evict once the change is visible to them
+    transaction.on_commit(lambda: invalidation_bus.publish(instance.pk, hosts))
+
+
+@receiver([post_save, post_delete], sender=TenantDomain)
+def invalidate_domain_resolution(sender, instance, **kwargs):
+    """Forget cached hosts for the tenant owning an added, edited or removed domain"""
+    hosts = [instance.domain]
+    apply_invalidation(instance.tenant_id, hosts)
+    transaction.on_commit(lambda: invalidation_bus.publish(instance.tenant_id, hosts))
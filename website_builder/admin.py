@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import WebsiteProject, WebsiteDomain, WebsiteContent, DomainOrder, AIWebsiteTemplate
+from .models import WebsiteProject, WebsiteDomain, WebsiteContent, DomainOrder, AIWebsiteTemplate, GenerationJob
 
 
 @admin.register(WebsiteProject)
@@ -123,6 +123,17 @@ class AIWebsiteTemplateAdmin(admin.ModelAdmin):
     )
 
 
+@admin.register(GenerationJob)
+class GenerationJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'kind', 'status', 'user', 'website', 'created_at', 'finished_at']
+    list_filter = ['kind', 'status', 'created_at']
+    search_fields = ['user__username', 'website__name', 'error_message']
+    readonly_fields = ['created_at', 'started_at', 'finished_at']
+    
+    def get_queryset(self, request):
+        return super().get_queryset(request).select_related('user', 'website')
+
+
 # Customize admin site header
 admin.site.site_header = "JCW Website Builder Admin"
 admin.site.site_title = "Website Builder"
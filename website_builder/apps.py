@@ -4,4 +4,8 @@ from django.apps import AppConfig
 class WebsiteBuilderConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'website_builder'
-    verbose_name = 'Website Builder'
\ No newline at end of file
+    verbose_name = 'Website Builder'
+
+    def ready(self):
+        # Register site manifest invalidation handlers
+        from . import signals
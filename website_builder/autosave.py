@@ -0,0 +1,426 @@
+"""
+Write-behind buffer for editor autosaves
+Editor saves are merged into one cached record per website instead of being written
+to WebsiteContent on every keystroke. A page is read from the database the first
+time it is buffered; later saves only touch the cache. The record is flushed as a
+single save_changes() call once its oldest change is AUTOSAVE_FLUSH_INTERVAL seconds
+old: by the next save, or by a Celery task queued with that countdown when the buffer
+becomes dirty (the flush_autosaves command covers setups without a broker). Buffers
+are also flushed when the editor session ends (pagehide beacon, logout) and before
+publishing.
+
+Every buffered change still gets its own revision number, so editor patches keep
+their conflict checks; a flush advances the page by all of them at once. A flush only
+writes the values the buffer changed, each guarded by a JSON Patch "test" of the value
+it replaces: pages saved elsewhere meanwhile keep those changes, unless they touched
+the same values, in which case the page's buffered edits are dropped and the flush
+raises RevisionConflict. Editor reads
+go through overlay_pages() to see buffered content. The buffer must live in a cache
+shared by all workers and the flush_autosaves command, so buffering is only on by
+default with the Redis cache (SHARED_CACHE); AUTOSAVE_FLUSH_INTERVAL = 0 writes
+every save straight through. With Redis, dirty buffers are indexed in a sorted set, so
+editors of different websites never wait on each other.
+"""
+import logging
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Iterable, Optional
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.core.cache.backends.redis import RedisCache
+
+from .editing import PROJECT_FIELDS, RevisionConflict, SaveResult, apply_full_content, publish_saved_changes, save_changes
+from .jsonpatch import JsonPatchError, apply_patch
+from .models import WebsiteContent, WebsiteProject
+
+logger = logging.getLogger(__name__)
+
+AUTOSAVE_FLUSH_INTERVAL = getattr(settings, 'AUTOSAVE_FLUSH_INTERVAL', 0)
+AUTOSAVE_BUFFER_TIMEOUT = getattr(settings, 'AUTOSAVE_BUFFER_TIMEOUT', 86400)
+AUTOSAVE_LOCK_TIMEOUT = 10
+
+# Index of every buffer holding unflushed changes: a Redis sorted set of
+# "<website id>:<user id>" scored by since, or with other caches a dict of
+# website id -> {'since', 'user_id'}
+DIRTY_KEY = 'autosave:dirty'
+
+
+class AutosaveBusy(Exception):
+    """The buffer lock could not be taken in time"""
+
+
+def buffer_key(website_id) -> str:
+    return f"autosave:buffer:{website_id}"
+
+
+@contextmanager
+def cache_lock(name: str, timeout: int = AUTOSAVE_LOCK_TIMEOUT):
+    """Mutual exclusion across workers through cache.add()"""
+    key = f"autosave:lock:{name}"
+    token = uuid.uuid4().hex
+    deadline = time.monotonic() + timeout
+    while not cache.add(key, token, timeout):
+        if time.monotonic() > deadline:
+            raise AutosaveBusy(f"Timed out waiting for {key}")
+        time.sleep(0.02)
+    try:
+        yield
+    finally:
+        if cache.get(key) == token:
+            cache.delete(key)
+
+
+def empty_record(website) -> dict:
+    return {
+        'website_id': str(website.id),
+        'user_id': website.user_id,
+        'since': None,      # When the oldest unflushed change was buffered
+        'project': {},      # Editor change key -> value
+        'pages': {},        # slug -> {document, base_document, block_hashes, base_revision, revision}
+        'settled': {},      # slug -> [editor revision, database revision] after a flush
+    }
+
+
+def load_record(website) -> dict:
+    return cache.get(buffer_key(website.id)) or empty_record(website)
+
+
+def redis_client():
+    """Client of the default cache for set operations, or None if it is not Redis"""
+    backend = caches['default']
+    if isinstance(backend, RedisCache):
+        return backend._cache.get_client(write=True)
+    return None
+
+
+def store_record(record: dict) -> None:
+    cache.set(buffer_key(record['website_id']), record, AUTOSAVE_BUFFER_TIMEOUT)
+    mark_dirty(record)
+
+
+def mark_dirty(record: dict) -> None:
+    """Add a record with unflushed changes to the dirty index, or remove a clean one"""
+    client = redis_client()
+    if client is not None:
+        key = cache.make_key(DIRTY_KEY)
+        member = f"{record['website_id']}:{record['user_id']}"
+        if record['since'] is None:
+            client.zrem(key, member)
+        else:
+            client.zadd(key, {member: record['since']})
+        return
+    # Without Redis buffering is a development setup (see SHARED_CACHE), where the lock is uncontended
+    with cache_lock('dirty'):
+        dirty = cache.get(DIRTY_KEY) or {}
+        if record['since'] is None:
+            dirty.pop(record['website_id'], None)
+        else:
+            dirty[record['website_id']] = {'since': record['since'], 'user_id': record['user_id']}
+        cache.set(DIRTY_KEY, dirty, AUTOSAVE_BUFFER_TIMEOUT)
+
+
+def buffered_page(entry: dict, slug: str) -> WebsiteContent:
+    """Unsaved page holding a buffered document, for patching and hashing"""
+    return WebsiteContent(page_slug=slug, block_hashes=entry['block_hashes'], **entry['document'])
+
+
+def new_entry(record: dict, page: WebsiteContent) -> dict:
+    return {
+        'document': page.patch_document(),
+        # The database document the buffered changes are relative to
+        'base_document': page.patch_document(),
+        'block_hashes': page.block_hashes or [],
+        'base_revision': page.revision,
+        # After a flush that changed nothing the editor is ahead of the database revision
+        'revision': settled_revision(record, page.page_slug, page.revision),
+    }
+
+
+def merge_changes(record: dict, website, changes: dict, rows: dict) -> SaveResult:
+    """
+    Merge an editor save into record in place
+    rows holds the database pages of slugs not buffered yet. Raises RevisionConflict
+    (leaving record unusable) when a patch targets a stale revision.
+    """
+    result = SaveResult()
+    for key, field in PROJECT_FIELDS.items():
+        if key in changes:
+            record['project'][key] = changes[key]
+            result.website_changed = result.website_changed or changes[key] != getattr(website, field)
+
+    conflicts = {}
+    for page_data in changes.get('content', {}).get('pages', []):
+        slug = page_data.get('slug', 'home')
+        entry = record['pages'].get(slug) or new_entry(record, rows[slug])
+        page = buffered_page(entry, slug)
+        patch = page_data.get('patch')
+        if patch is not None:
+            if page_data.get('revision') != entry['revision']:
+                conflicts[slug] = entry['revision']
+                continue
+            page.apply_patch(patch)
+        else:
+            apply_full_content(page, page_data)
+
+        result.revisions[slug] = entry['revision']
+        document = page.patch_document()
+        if document == entry['document']:
+            continue
+        result.changed_pages[slug] = page.changed_blocks()
+        result.blocks[slug] = document['content_blocks']
+        if document['page_title'] != entry['document']['page_title']:
+            result.navigation_changed = True
+        entry['document'] = document
+        entry['block_hashes'], _ = page.compute_hashes()
+        entry['revision'] += 1
+        result.revisions[slug] = entry['revision']
+        record['pages'][slug] = entry
+
+    if conflicts:
+        raise RevisionConflict(conflicts)
+    if record['since'] is None and (record['pages'] or record['project']):
+        record['since'] = time.time()
+    return result
+
+
+def pointer_token(key) -> str:
+    return str(key).replace('~', '~0').replace('/', '~1')
+
+
+def document_changes(base, current, path: str = '') -> list:
+    """(pointer, old value, new value) of the smallest parts of current that differ from base"""
+    if base == current:
+        return []
+    if isinstance(base, dict) and isinstance(current, dict) and base.keys() == current.keys():
+        keys = base.keys()
+    elif isinstance(base, list) and isinstance(current, list) and len(base) == len(current):
+        keys = range(len(base))
+    else:
+        return [(path, base, current)]
+    return [
+        change
+        for key in keys
+        for change in document_changes(base[key], current[key], f'{path}/{pointer_token(key)}')
+    ]
+
+
+def entry_patch(entry: dict) -> list:
+    """The buffered changes of a page as a patch that fails if their targets changed meanwhile"""
+    patch = []
+    for path, old, new in document_changes(entry['base_document'], entry['document']):
+        patch.append({'op': 'test', 'path': path, 'value': old})
+        patch.append({'op': 'replace', 'path': path, 'value': new})
+    return patch
+
+
+def flush_changes(record: dict) -> dict:
+    """The buffered record as a save_changes() payload"""
+    changes = dict(record['project'])
+    if record['pages']:
+        changes['content'] = {'pages': [
+            {
+                'slug': slug,
+                'revision': entry['base_revision'],
+                'advance': entry.get('advance', entry['revision'] - entry['base_revision']),
+                'patch': entry_patch(entry),
+            }
+            for slug, entry in record['pages'].items()
+        ]}
+    return changes
+
+
+def rebase_pages(website, record: dict, slugs: Iterable[str]) -> dict:
+    """
+    Move buffered pages onto the revisions saved outside the editor
+    Pages whose buffered values were changed there are dropped from record; returns
+    their current revisions.
+    """
+    conflicts = {}
+    for page in WebsiteContent.objects.filter(website=website, page_slug__in=list(slugs)):
+        entry = record['pages'][page.page_slug]
+        try:
+            apply_patch(page.patch_document(), entry_patch(entry))
+        except JsonPatchError:
+            logger.warning(f"Autosaves of page {page.page_slug!r} of website {website.id} conflict with revision {page.revision}; dropped")
+            del record['pages'][page.page_slug]
+            conflicts[page.page_slug] = page.revision
+            continue
+        entry['advance'] = entry.get('advance', entry['revision'] - entry['base_revision'])
+        entry['base_revision'] = page.revision
+    return conflicts
+
+
+def flush_record(website, record: dict) -> Optional[SaveResult]:
+    """
+    Write a buffered record to the database and empty it; the caller holds its lock
+    Raises RevisionConflict, after writing everything else, for pages whose buffered
+    values were changed by a save outside the editor.
+    """
+    if record['since'] is None:
+        # The buffer expired before it was flushed
+        mark_dirty(record)
+        return None
+    conflicts = {}
+    try:
+        result = save_changes(website, flush_changes(record))
+    except RevisionConflict as e:
+        # Something outside the editor saved these pages meanwhile
+        conflicts = rebase_pages(website, record, e.conflicts)
+        result = save_changes(website, flush_changes(record))
+    publish_saved_changes(website.id, result)
+
+    record['settled'].update({
+        slug: [entry['revision'], result.revisions[slug]] for slug, entry in record['pages'].items()
+    })
+    for slug in conflicts:
+        record['settled'].pop(slug, None)
+    record.update(since=None, project={}, pages={})
+    store_record(record)
+    logger.info(f"Flushed autosaves of website {website.id}: {', '.join(result.changed_pages) or 'no page changes'}")
+    if conflicts:
+        raise RevisionConflict(conflicts)
+    return result
+
+
+def write_through(website, changes: dict) -> SaveResult:
+    result = save_changes(website, changes)
+    publish_saved_changes(website.id, result)
+    return result
+
+
+def schedule_flush(website_id) -> None:
+    """Flush a buffer that just became dirty on the Celery workers once it is due"""
+    if not getattr(settings, 'CELERY_BROKER_URL', None):
+        return
+    from .tasks import flush_autosave_buffer
+    try:
+        flush_autosave_buffer.apply_async((str(website_id),), countdown=AUTOSAVE_FLUSH_INTERVAL)
+    except Exception as e:
+        logger.error(f"Could not schedule the autosave flush of website {website_id}: {e}")
+
+
+def buffer_changes(website, changes: dict) -> SaveResult:
+    """
+    Apply an editor save through the buffer
+    Returns what changed relative to the buffered state; raises like save_changes().
+    Saves that create pages are written through, after flushing the buffer.
+    """
+    if AUTOSAVE_FLUSH_INTERVAL <= 0:
+        return write_through(website, changes)
+
+    slugs = {page_data.get('slug', 'home') for page_data in changes.get('content', {}).get('pages', [])}
+    with cache_lock(str(website.id)):
+        record = load_record(website)
+        unbuffered = slugs - set(record['pages'])
+        rows = {}
+        if unbuffered:
+            rows = {page.page_slug: page for page in WebsiteContent.objects.filter(website=website, page_slug__in=unbuffered)}
+        if unbuffered - set(rows):
+            flush_record(website, record)
+            return write_through(website, changes)
+
+        was_clean = record['since'] is None
+        result = merge_changes(record, website, changes, rows)
+        if record['since'] is not None and time.time() - record['since'] >= AUTOSAVE_FLUSH_INTERVAL:
+            flush_record(website, record)
+        else:
+            store_record(record)
+            if was_clean and record['since'] is not None:
+                schedule_flush(website.id)
+        return result
+
+
+def flush_website(website) -> Optional[SaveResult]:
+    """Write a website's buffered changes now, e.g. when its editor session ends"""
+    with cache_lock(str(website.id)):
+        return flush_record(website, load_record(website))
+
+
+def dirty_buffers() -> dict:
+    """website id -> {'since', 'user_id'} of every buffer holding unflushed changes"""
+    client = redis_client()
+    if client is None:
+        return cache.get(DIRTY_KEY) or {}
+    dirty = {}
+    for member, since in client.zrange(cache.make_key(DIRTY_KEY), 0, -1, withscores=True):
+        website_id, _, user_id = member.decode().partition(':')
+        dirty[website_id] = {'since': since, 'user_id': int(user_id)}
+    return dirty
+
+
+def flush_buffers(website_ids: Iterable[str]) -> int:
+    """Flush the buffers of website_ids; returns how many were written"""
+    flushed = 0
+    for website in WebsiteProject.objects.filter(id__in=list(website_ids)):
+        try:
+            if flush_website(website) is not None:
+                flushed += 1
+        except Exception as e:
+            logger.error(f"Could not flush autosaves of website {website.id}: {e}")
+    return flushed
+
+
+def flush_due(max_age: int = AUTOSAVE_FLUSH_INTERVAL) -> int:
+    """Flush every buffer whose oldest change is at least max_age seconds old"""
+    now = time.time()
+    return flush_buffers(
+        website_id for website_id, state in dirty_buffers().items() if now - state['since'] >= max_age
+    )
+
+
+def flush_user_buffers(user_id) -> int:
+    return flush_buffers(
+        website_id for website_id, state in dirty_buffers().items() if state['user_id'] == user_id
+    )
+
+
+def overlay_pages(website, pages: Iterable[WebsiteContent]) -> list:
+    """
+    Pages (and the project's name/description) as the editor last saved them
+    Buffered documents and revisions replace the database values in memory.
+    """
+    pages = list(pages)
+    record = cache.get(buffer_key(website.id))
+    if not record:
+        return pages
+    for key, value in record['project'].items():
+        setattr(website, PROJECT_FIELDS[key], value)
+    for page in pages:
+        apply_overlay(record, page)
+    return pages
+
+
+def overlay_page(page: WebsiteContent) -> WebsiteContent:
+    """A single page as the editor last saved it, without loading its website"""
+    record = cache.get(buffer_key(page.website_id))
+    if record:
+        apply_overlay(record, page)
+    return page
+
+
+def apply_overlay(record: dict, page: WebsiteContent) -> None:
+    entry = record['pages'].get(page.page_slug)
+    if entry is None:
+        page.revision = settled_revision(record, page.page_slug, page.revision)
+        return
+    for field, value in entry['document'].items():
+        setattr(page, field, value)
+    page.block_hashes = entry['block_hashes']
+    page.revision = entry['revision']
+
+
+def settled_revision(record: dict, slug: str, revision: int) -> int:
+    """The editor's revision for a page stored at revision with nothing buffered"""
+    settled = record['settled'].get(slug)
+    return settled[0] if settled and settled[1] == revision else revision
+
+
+def editor_revision(website_id, slug: str, revision: int) -> int:
+    """The revision the editor sees for a page stored at revision, without loading it"""
+    record = cache.get(buffer_key(website_id))
+    if not record:
+        return revision
+    entry = record['pages'].get(slug)
+    return entry['revision'] if entry else settled_revision(record, slug, revision)
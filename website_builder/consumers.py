@@ -0,0 +1,66 @@
+"""
+WebSocket consumers for the website builder
+PreviewConsumer joins a website's preview group (see website_builder.preview).
+Previews listen for fragments; the editor sends blocks as they are typed, which are
+rendered once and broadcast to every preview of the website without being saved.
+"""
+import logging
+
+from asgiref.sync import sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+
+from .models import WebsiteProject
+from .preview import blocks_event, preview_group
+
+logger = logging.getLogger(__name__)
+
+
+class PreviewConsumer(AsyncJsonWebsocketConsumer):
+    """
+    Per-website live preview channel
+    Client -> server: {"type": "block", "page": slug, "index": n, "block": {...}, "count": n}
+    Server -> client: {"type": "blocks", "page": slug, "blocks": [[index, html], ...], "count": n}
+    and {"type": "reload"} when the whole page must be fetched again.
+    """
+
+    async def connect(self):
+        self.group = None
+        website_id = self.scope['url_route']['kwargs']['website_id']
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        if not await WebsiteProject.objects.filter(id=website_id, user=user).aexists():
+            await self.close(code=4403)
+            return
+        self.group = preview_group(website_id)
+        await self.channel_layer.group_add(self.group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        if self.group:
+            await self.channel_layer.group_discard(self.group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('type') != 'block':
+            await self.send_json({'type': 'error', 'error': 'Unknown message type'})
+            return
+        slug, index, block, count = content.get('page'), content.get('index'), content.get('block'), content.get('count')
+        if not isinstance(slug, str) or not isinstance(index, int) or index < 0 or not isinstance(block, dict):
+            await self.send_json({'type': 'error', 'error': 'A block message needs page, index and block'})
+            return
+        if not isinstance(count, int) or count <= index:
+            count = None
+        event = await sync_to_async(blocks_event)(slug, [(index, block)], count)
+        await self.channel_layer.group_send(self.group, event)
+
+    async def preview_blocks(self, event):
+        await self.send_json({
+            'type': 'blocks',
+            'page': event['page'],
+            'blocks': event['blocks'],
+            'count': event.get('count'),
+        })
+
+    async def preview_reload(self, event):
+        await self.send_json({'type': 'reload'})
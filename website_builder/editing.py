@@ -0,0 +1,206 @@
+"""
+Server-side application of website editor saves
+A page in a save payload either carries its full content, or a JSON Patch against a
+known revision. A whole save runs in one transaction with a constant number of
+queries: one SELECT for every page in the payload, one bulk INSERT for new pages and
+one bulk UPDATE of the fields that changed.
+"""
+import logging
+from typing import List
+
+from django.db import transaction
+from django.utils import timezone
+
+from .history import record_revisions
+from .jsonpatch import JsonPatchError
+from .models import WebsiteContent
+from .publishing import republish_site
+from .purging import purge_pages, purge_website
+from .serving import invalidate_website
+
+logger = logging.getLogger(__name__)
+
+# Editor change keys -> WebsiteProject fields
+PROJECT_FIELDS = {
+    'name': 'name',
+    'description': 'ai_description',
+}
+
+# Maintained alongside any content change; bulk_update skips save() and auto_now
+TRACKING_FIELDS = ['content_hash', 'block_hashes', 'revision', 'updated_at']
+
+
+class RevisionConflict(Exception):
+    """A patch was made against a revision that is no longer current"""
+
+    def __init__(self, conflicts: dict):
+        self.conflicts = conflicts
+        super().__init__(f"Stale revisions for pages: {', '.join(conflicts)}")
+
+
+class SaveResult:
+    """What a save changed, for the editor response and cache purging"""
+
+    def __init__(self):
+        self.website_changed = False
+        self.changed_pages = {}  # slug -> indexes of changed blocks
+        self.changed_page_ids = []
+        self.navigation_changed = False
+        self.revisions = {}  # slug -> current revision
+        self.blocks = {}  # slug -> content_blocks of changed pages, for the live preview
+
+    def as_dict(self) -> dict:
+        return {
+            'changed_pages': self.changed_pages,
+            'navigation_changed': self.navigation_changed,
+            'revisions': self.revisions,
+        }
+
+
+def apply_full_content(content: WebsiteContent, page_data: dict) -> None:
+    content.content_blocks = page_data.get('content_blocks', [])
+    content.seo_title = page_data.get('seo_title', '')
+    content.seo_description = page_data.get('seo_description', '')
+
+
+def new_page(website, slug: str, page_data: dict) -> WebsiteContent:
+    page = WebsiteContent(
+        website=website,
+        page_slug=slug,
+        page_type=page_data.get('type', 'custom'),
+        page_title=page_data.get('title', 'Untitled'),
+    )
+    apply_full_content(page, page_data)
+    return page
+
+
+def update_project(website, changes: dict) -> bool:
+    """Save the project only if one of its own fields actually changed"""
+    update_fields = []
+    for key, field in PROJECT_FIELDS.items():
+        if key in changes and getattr(website, field) != changes[key]:
+            setattr(website, field, changes[key])
+            update_fields.append(field)
+    if update_fields:
+        website.save(update_fields=update_fields + ['updated_at'])
+    return bool(update_fields)
+
+
+def save_changes(website, changes: dict) -> SaveResult:
+    """
+    Apply an editor save to the project and its pages in one transaction
+    Raises RevisionConflict (nothing is written) if any patch targets a stale revision,
+    and JsonPatchError if a patch cannot be applied. A page entry may carry "advance",
+    the number of revisions it stands for (coalesced autosaves); it defaults to 1.
+    """
+    result = SaveResult()
+    pages_data: List[dict] = changes.get('content', {}).get('pages', []) if 'content' in changes else []
+
+    with transaction.atomic():
+        result.website_changed = update_project(website, changes)
+
+        slugs = {page_data.get('slug', 'home') for page_data in pages_data}
+        existing = {}
+        if slugs:
+            existing = {
+                page.page_slug: page
+                for page in WebsiteContent.objects.select_for_update().filter(website=website, page_slug__in=slugs)
+            }
+        originals = {slug: page.patch_document() for slug, page in existing.items()}
+        original_revisions = {slug: page.revision for slug, page in existing.items()}
+
+        created = {}
+        conflicts = {}
+        advance = {}
+        for page_data in pages_data:
+            slug = page_data.get('slug', 'home')
+            advance[slug] = max(1, int(page_data.get('advance', 1)))
+            page = existing.get(slug) or created.get(slug)
+            patch = page_data.get('patch')
+            if patch is not None:
+                if page is None:
+                    raise JsonPatchError(f"Page {slug!r} does not exist")
+                if page_data.get('revision') != page.revision:
+                    conflicts[slug] = page.revision
+                    continue
+                page.apply_patch(patch)
+            elif page is None:
+                created[slug] = new_page(website, slug, page_data)
+            else:
+                apply_full_content(page, page_data)
+
+        if conflicts:
+            # Leaving the atomic block rolls back the project update too
+            raise RevisionConflict(conflicts)
+
+        now = timezone.now()
+        changed = []
+        update_fields = set()
+        for slug, page in existing.items():
+            block_hashes, content_hash = page.compute_hashes()
+            if content_hash == page.content_hash:
+                continue
+            result.changed_pages[slug] = page.changed_blocks()
+            result.blocks[slug] = page.content_blocks
+            update_fields.update(
+                field for field, value in page.patch_document().items() if value != originals[slug][field]
+            )
+            if page.page_title != originals[slug]['page_title']:
+                result.navigation_changed = True
+            page.block_hashes, page.content_hash = block_hashes, content_hash
+            page.revision += advance.get(slug, 1)
+            page.updated_at = now
+            changed.append(page)
+
+        for slug, page in created.items():
+            page.block_hashes, page.content_hash = page.compute_hashes()
+            result.changed_pages[slug] = list(range(len(page.content_blocks)))
+            result.blocks[slug] = page.content_blocks
+            result.navigation_changed = True
+
+        if created:
+            WebsiteContent.objects.bulk_create(created.values())
+        if changed:
+            WebsiteContent.objects.bulk_update(changed, sorted(update_fields) + TRACKING_FIELDS)
+            result.changed_page_ids = [page.id for page in changed]
+        record_revisions(
+            [(page, originals[page.page_slug], original_revisions[page.page_slug]) for page in changed]
+            + [(page, None, None) for page in created.values()]
+        )
+
+        result.revisions = {slug: page.revision for slug, page in {**existing, **created}.items()}
+
+        if created or changed:
+            # Bulk writes bypass the post_save handlers in website_builder.signals
+            transaction.on_commit(lambda: invalidate_website(website.id))
+    return result
+
+
+def publish_saved_changes(website_id, result: SaveResult) -> None:
+    """
+    Bring the live site up to date with a save, then purge what it changed at the edge
+    Pre-rendered sites get a new version in which only the changed pages are rendered
+    again (see publishing.prerender_website). Navigation and branding are on every page.
+    """
+    if not (result.website_changed or result.navigation_changed or result.changed_page_ids):
+        return
+    page_ids = None if result.website_changed or result.navigation_changed else list(result.changed_page_ids)
+
+    def publish():
+        if republish_site(website_id, page_ids) is not None:
+            return
+        if page_ids is None:
+            purge_website(website_id)
+        else:
+            purge_pages(page_ids)
+
+    transaction.on_commit(publish)
+
+
+def restore_revision(page: WebsiteContent, document: dict) -> SaveResult:
+    """Make a past document the page's current content, as a new revision"""
+    return save_changes(page.website, {'content': {'pages': [{
+        'slug': page.page_slug,
+        'revision': page.revision,
+        'patch': [{'op': 'replace', 'path': '', 'value': document}],
+    }]}})
@@ -0,0 +1,177 @@
+"""
+Compact revision history for WebsiteContent
+Every content change stores a WebsiteContentRevision: a full snapshot every
+CONTENT_REVISION_SNAPSHOT_EVERY revisions (or when a delta would not be smaller),
+and diff-match-patch deltas in between. Reconstructing a revision applies at most
+that many deltas to the nearest snapshot. compact_page_history keeps the newest
+revisions plus one snapshot per day inside the retention window, so storage per page
+stays bounded however often the editor autosaves.
+"""
+import json
+import logging
+from datetime import timedelta
+from typing import Iterable, List, Optional, Tuple
+
+from diff_match_patch import diff_match_patch
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+
+from .models import WebsiteContent, WebsiteContentRevision
+
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_EVERY = getattr(settings, 'CONTENT_REVISION_SNAPSHOT_EVERY', 25)
+KEEP_LATEST = getattr(settings, 'CONTENT_REVISION_KEEP_LATEST', 50)
+RETENTION_DAYS = getattr(settings, 'CONTENT_REVISION_RETENTION_DAYS', 30)
+
+
+class HistoryError(Exception):
+    """A stored revision chain could not be applied"""
+
+
+def document_text(document: dict) -> str:
+    """
+    Canonical JSON text of a page document
+    One line per value keeps diffs line-based, small and fast to compute
+    """
+    return json.dumps(document, sort_keys=True, indent=1, ensure_ascii=False)
+
+
+def make_delta(old_text: str, new_text: str) -> str:
+    dmp = diff_match_patch()
+    chars_old, chars_new, lines = dmp.diff_linesToChars(old_text, new_text)
+    diffs = dmp.diff_main(chars_old, chars_new, False)
+    dmp.diff_charsToLines(diffs, lines)
+    return dmp.patch_toText(dmp.patch_make(old_text, diffs))
+
+
+def apply_delta(text: str, delta: str) -> str:
+    dmp = diff_match_patch()
+    patched, results = dmp.patch_apply(dmp.patch_fromText(delta), text)
+    if not all(results):
+        raise HistoryError("Revision delta did not apply cleanly")
+    return patched
+
+
+def build_revision(page: WebsiteContent, base: Optional[WebsiteContentRevision], base_text: Optional[str]):
+    """Unsaved revision row for page's current document, as a delta on base when worthwhile"""
+    text = document_text(page.patch_document())
+    if base is not None and base_text is not None and base.chain_length + 1 < SNAPSHOT_EVERY:
+        delta = make_delta(base_text, text)
+        if len(delta) < len(text) // 2:
+            return WebsiteContentRevision(
+                page=page, revision=page.revision, data=delta,
+                chain_length=base.chain_length + 1, size=len(delta.encode()),
+            )
+    return WebsiteContentRevision(
+        page=page, revision=page.revision, data=text, is_snapshot=True, size=len(text.encode()),
+    )
+
+
+def record_revisions(changes: Iterable[Tuple[WebsiteContent, Optional[dict], Optional[int]]]) -> None:
+    """
+    Store the current revision of saved pages with two queries for any number of pages
+    changes holds (page, previous document, previous revision); without a previous
+    document, or when that revision is not stored, a snapshot is written.
+    """
+    changes = list(changes)
+    if not changes:
+        return
+    wanted = Q(pk__in=[])
+    for page, _, previous_revision in changes:
+        if previous_revision is not None:
+            wanted |= Q(page_id=page.id, revision=previous_revision)
+    bases = {(row.page_id, row.revision): row for row in WebsiteContentRevision.objects.filter(wanted)}
+
+    rows = []
+    for page, previous_document, previous_revision in changes:
+        base = bases.get((page.id, previous_revision))
+        base_text = document_text(previous_document) if previous_document is not None else None
+        rows.append(build_revision(page, base, base_text))
+    WebsiteContentRevision.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+def chain_for(page_id, revision: int) -> List[WebsiteContentRevision]:
+    """Nearest snapshot at or before revision followed by the deltas up to it, in one query"""
+    snapshot = (
+        WebsiteContentRevision.objects
+        .filter(page_id=page_id, revision__lte=revision, is_snapshot=True)
+        .values('revision').order_by('-revision')[:1]
+    )
+    return list(
+        WebsiteContentRevision.objects
+        .filter(page_id=page_id, revision__lte=revision, revision__gte=snapshot)
+        .order_by('revision')
+    )
+
+
+def reconstruct(rows: List[WebsiteContentRevision]) -> str:
+    if not rows or not rows[0].is_snapshot:
+        raise HistoryError("Revision chain does not start with a snapshot")
+    text = rows[0].data
+    for row in rows[1:]:
+        text = row.data if row.is_snapshot else apply_delta(text, row.data)
+    return text
+
+
+def document_at(page_id, revision: int) -> Optional[dict]:
+    """The page document as of a stored revision, or None if it is not kept"""
+    rows = chain_for(page_id, revision)
+    if not rows or rows[-1].revision != revision:
+        return None
+    return json.loads(reconstruct(rows))
+
+
+@transaction.atomic
+def compact_page_history(page_id, keep_latest: int = KEEP_LATEST, retention_days: int = RETENTION_DAYS) -> int:
+    """
+    Drop old revisions of a page: keep the newest keep_latest, plus the last revision of
+    each day within retention_days as a snapshot. Returns the number of rows deleted.
+    """
+    rows = list(WebsiteContentRevision.objects.select_for_update().filter(page_id=page_id).order_by('revision'))
+    if len(rows) <= keep_latest:
+        return 0
+
+    cutoff = timezone.now() - timedelta(days=retention_days)
+    older, latest = rows[:-keep_latest], rows[-keep_latest:]
+    daily = {}
+    for row in older:
+        if row.created_at >= cutoff:
+            daily[row.created_at.date()] = row
+    kept = set(row.pk for row in daily.values()) | set(row.pk for row in latest)
+
+    # Walk the chain once; kept rows whose base may disappear become snapshots
+    text = None
+    previous_kept = False
+    to_update = []
+    chain_length = 0
+    for row in rows:
+        text = row.data if row.is_snapshot else apply_delta(text, row.data)
+        if row.pk not in kept:
+            previous_kept = False
+            continue
+        converted = not row.is_snapshot and not previous_kept
+        if converted:
+            row.is_snapshot, row.data, row.size = True, text, len(text.encode())
+        chain_length = 0 if row.is_snapshot else chain_length + 1
+        if converted or row.chain_length != chain_length:
+            row.chain_length = chain_length
+            to_update.append(row)
+        previous_kept = True
+
+    if to_update:
+        WebsiteContentRevision.objects.bulk_update(to_update, ['is_snapshot', 'data', 'size', 'chain_length'])
+    deleted, _ = WebsiteContentRevision.objects.filter(page_id=page_id).exclude(pk__in=kept).delete()
+    return deleted
+
+
+def pages_needing_compaction(keep_latest: int = KEEP_LATEST):
+    """Ids of pages with more stored revisions than keep_latest"""
+    return (
+        WebsiteContentRevision.objects.values('page_id')
+        .annotate(rows=Count('id')).filter(rows__gt=keep_latest)
+        .values_list('page_id', flat=True)
+    )
+
@@ -0,0 +1,317 @@
+"""
+Background AI generation jobs
+Views create a GenerationJob and return at once; the LLM call and page creation run
+on a backend chosen by GENERATION_JOB_BACKEND:
+- 'celery': the generate_website task on the Celery workers (production)
+- 'thread': a daemon thread in the web process (development only; the thread dies
+  with its worker)
+- 'sync': inline in the request that queued it (tests)
+Jobs still queued or running after GENERATION_JOB_TIMEOUT are marked failed, by the
+status endpoints on their next poll and by the fail_stale_generation_jobs command.
+Clients poll the job's status endpoint until it has finished, or follow its event
+stream: with GENERATION_STREAMING each field, page and rendered block is appended to
+a cached event log while the model writes it, and served as Server-Sent Events.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from datetime import timedelta
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+from django.urls import reverse
+from django.utils import timezone
+
+from .models import GenerationJob
+from .rendering import render_fragments
+from .services import AIContentGenerator
+
+logger = logging.getLogger(__name__)
+
+GENERATION_JOB_BACKEND = getattr(settings, 'GENERATION_JOB_BACKEND', 'thread')
+GENERATION_STREAMING = getattr(settings, 'GENERATION_STREAMING', True)
+GENERATION_EVENTS_TIMEOUT = getattr(settings, 'GENERATION_EVENTS_TIMEOUT', 3600)
+GENERATION_STREAM_TIMEOUT = getattr(settings, 'GENERATION_STREAM_TIMEOUT', 300)
+GENERATION_JOB_TIMEOUT = getattr(settings, 'GENERATION_JOB_TIMEOUT', 600)
+
+if GENERATION_JOB_BACKEND == 'thread' and not settings.DEBUG:
+    logger.warning("GENERATION_JOB_BACKEND is 'thread': generation jobs die with their web worker; use Celery in production")
+
+# Server-Sent Events pacing, in seconds
+EVENT_POLL_INTERVAL = 0.25
+STATUS_CHECK_INTERVAL = 2
+KEEPALIVE_INTERVAL = 15
+
+STALE_JOB_ERROR = 'Generation took too long and was stopped. Please try again.'
+
+
+class JobEventLog:
+    """
+    Append-only event log of a job in the cache
+    Event n is stored under its own key and the count is written last, so readers
+    never see a partial log; a job has a single writer.
+    """
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+        self.count = 0
+
+    def append(self, event: dict) -> None:
+        cache.set(event_key(self.job_id, self.count), event, GENERATION_EVENTS_TIMEOUT)
+        self.count += 1
+        cache.set(event_count_key(self.job_id), self.count, GENERATION_EVENTS_TIMEOUT)
+
+
+def event_key(job_id, number: int) -> str:
+    return f"generation:event:{job_id}:{number}"
+
+
+def event_count_key(job_id) -> str:
+    return f"generation:events:{job_id}"
+
+
+def job_status_data(job: GenerationJob) -> dict:
+    data = {
+        'id': str(job.id),
+        'kind': job.kind,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'finished': job.is_finished,
+        'error': job.error_message,
+    }
+    if job.status == 'succeeded' and job.website_id:
+        data['redirect_url'] = reverse('website_builder:edit', kwargs={'slug': job.website.slug})
+    return data
+
+
+def structure_event_data(event) -> dict:
+    """A parsed part of the structure as an event for the preview"""
+    if event.kind == 'reset':
+        return {'type': 'reset'}
+    if event.kind == 'block':
+        _, page_index, _, block_index = event.path
+        return {
+            'type': 'block',
+            'page': page_index,
+            'index': block_index,
+            'block': event.value,
+            'html': render_fragments([event.value])[0] if isinstance(event.value, dict) else '',
+        }
+    if event.kind == 'page':
+        page = event.value if isinstance(event.value, dict) else {}
+        return {
+            'type': 'page',
+            'index': event.path[1],
+            'title': page.get('title'),
+            'slug': page.get('slug'),
+            'page_type': page.get('type'),
+        }
+    return {'type': 'field', 'name': event.path[0], 'value': event.value}
+
+
+def generate_structure(log: JobEventLog, **details) -> dict:
+    """Run the generator, streaming its progress into log when GENERATION_STREAMING is on"""
+    generator = AIContentGenerator()
+    if not GENERATION_STREAMING:
+        return generator.generate_website_structure(**details)
+    generated_content = None
+    for event in generator.stream_website_structure(**details):
+        if event.kind == 'done':
+            generated_content = event.value
+        else:
+            log.append(structure_event_data(event))
+    return generated_content
+
+
+def generate_site(job: GenerationJob, log: JobEventLog) -> None:
+    """AI builder: generate the structure, then the pages of a new website"""
+    from .views import create_default_pages
+
+    website = job.website
+    generated_content = generate_structure(
+        log,
+        website_type=job.payload['website_type'],
+        business_description=job.payload['business_description'],
+        website_name=job.payload['website_name'],
+    )
+    with transaction.atomic():
+        website.ai_generated_data = generated_content
+        website.status = 'preview'
+        website.save()
+        create_default_pages(website, generated_content)
+
+
+def generate_pages(job: GenerationJob, log: JobEventLog) -> None:
+    """Editor: generate the default pages of an existing website"""
+    from .views import create_default_pages
+
+    website = job.website
+    generated_content = generate_structure(
+        log,
+        website_type=website.website_type,
+        business_description=f"A {website.get_website_type_display()} website",
+        website_name=website.name,
+    )
+    with transaction.atomic():
+        create_default_pages(website, generated_content)
+
+
+GENERATORS = {
+    'site': generate_site,
+    'pages': generate_pages,
+}
+
+
+def run_job(job_id) -> None:
+    """Run a queued job to completion, recording its outcome on the job"""
+    updated = GenerationJob.objects.filter(id=job_id, status='queued').update(
+        status='running', started_at=timezone.now()
+    )
+    if not updated:
+        # Already picked up by another worker, or cancelled
+        return
+    job = GenerationJob.objects.select_related('website').get(id=job_id)
+    log = JobEventLog(job.id)
+    try:
+        if job.website is None:
+            raise ValueError("The website of this job no longer exists")
+        GENERATORS[job.kind](job, log)
+    except Exception as e:
+        logger.exception(f"Generation job {job.id} failed")
+        job.status = 'failed'
+        job.error_message = str(e)
+        if job.kind == 'site' and job.website is not None:
+            # Don't leave a half-created website behind
+            job.website.delete()
+            job.website = None
+    else:
+        job.status = 'succeeded'
+        logger.info(f"Generation job {job.id} ({job.kind}) completed for website {job.website_id}")
+    job.finished_at = timezone.now()
+    recorded = GenerationJob.objects.filter(id=job.id, status='running').update(
+        status=job.status, error_message=job.error_message, website=job.website, finished_at=job.finished_at
+    )
+    if not recorded:
+        # Failed by fail_stale_jobs while it ran; that outcome stands
+        logger.warning(f"Generation job {job.id} finished after it timed out")
+        if job.kind == 'site' and job.website is not None:
+            job.website.delete()
+        return
+    log.append({'type': 'status', **job_status_data(job)})
+
+
+def stale_jobs():
+    """Jobs queued or running for longer than GENERATION_JOB_TIMEOUT"""
+    cutoff = timezone.now() - timedelta(seconds=GENERATION_JOB_TIMEOUT)
+    return GenerationJob.objects.filter(
+        Q(status='queued', created_at__lt=cutoff) | Q(status='running', started_at__lt=cutoff)
+    )
+
+
+def fail_jobs(queryset, error_message: str) -> int:
+    """
+    Mark unfinished jobs failed from outside their run, e.g. after their worker died
+    Site jobs' half-created websites are removed, as run_job does on failure.
+    """
+    failed = 0
+    for job in queryset.filter(status__in=['queued', 'running']).select_related('website'):
+        updated = GenerationJob.objects.filter(id=job.id, status=job.status).update(
+            status='failed',
+            error_message=error_message,
+            finished_at=timezone.now(),
+            website=None if job.kind == 'site' else job.website,
+        )
+        if not updated:
+            continue
+        failed += 1
+        logger.warning(f"Generation job {job.id} ({job.kind}) failed while {job.status}: {error_message}")
+        if job.kind == 'site' and job.website is not None:
+            job.website.delete()
+    return failed
+
+
+def fail_stale_jobs() -> int:
+    return fail_jobs(stale_jobs(), STALE_JOB_ERROR)
+
+
+def expire_if_stale(job: GenerationJob) -> GenerationJob:
+    """Fail a single unfinished job that has timed out; returns the up-to-date job"""
+    if not job.is_finished and fail_jobs(stale_jobs().filter(id=job.id), STALE_JOB_ERROR):
+        job = GenerationJob.objects.select_related('website').get(id=job.id)
+    return job
+
+
+def run_in_thread(job_id) -> None:
+    try:
+        run_job(job_id)
+    finally:
+        close_old_connections()
+
+
+def dispatch(job_id) -> None:
+    if GENERATION_JOB_BACKEND == 'celery':
+        from .tasks import generate_website
+        try:
+            generate_website.delay(str(job_id))
+        except Exception as e:
+            logger.error(f"Could not queue generation job {job_id}: {e}")
+            fail_jobs(GenerationJob.objects.filter(id=job_id), 'Generation could not be started. Please try again later.')
+    elif GENERATION_JOB_BACKEND == 'sync':
+        run_job(job_id)
+    else:
+        threading.Thread(target=run_in_thread, args=(job_id,), daemon=True).start()
+
+
+def enqueue_generation(user, website, kind: str, **payload) -> GenerationJob:
+    """Create a job and start it once the surrounding transaction has committed"""
+    job = GenerationJob.objects.create(user=user, website=website, kind=kind, payload=payload)
+    transaction.on_commit(lambda: dispatch(job.id))
+    return job
+
+
+def format_event(number: int, event: dict) -> str:
+    return f"id: {number}\nevent: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def stream_job_events(job_id, start: int = 0):
+    """
+    Server-Sent Events for a job, from event number start until its status event
+    Tails the cached event log without holding a thread; the job's row is only
+    checked every few seconds, for logs that expired or jobs that died.
+    """
+    number = start
+    deadline = time.monotonic() + GENERATION_STREAM_TIMEOUT
+    last_sent = last_checked = time.monotonic()
+    while time.monotonic() < deadline:
+        count = await cache.aget(event_count_key(job_id), 0)
+        if count > number:
+            keys = [event_key(job_id, n) for n in range(number, count)]
+            events = await cache.aget_many(keys)
+            for n, key in zip(range(number, count), keys):
+                event = events.get(key)
+                if event is None:
+                    continue
+                yield format_event(n, event)
+                if event['type'] == 'status':
+                    return
+            number = count
+            last_sent = time.monotonic()
+            continue
+
+        now = time.monotonic()
+        if now - last_checked >= STATUS_CHECK_INTERVAL:
+            last_checked = now
+            job = await GenerationJob.objects.select_related('website').aget(id=job_id)
+            job = await sync_to_async(expire_if_stale)(job)
+            if job.is_finished and await cache.aget(event_count_key(job_id), 0) <= number:
+                yield format_event(number, {'type': 'status', **job_status_data(job)})
+                return
+        if now - last_sent >= KEEPALIVE_INTERVAL:
+            last_sent = now
+            yield ": keepalive\n\n"
+        await asyncio.sleep(EVENT_POLL_INTERVAL)
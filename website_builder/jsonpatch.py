@@ -0,0 +1,156 @@
+"""
+RFC 6902 JSON Patch for editor saves
+Lets the editor send only the operations that changed a page instead of the whole
+content_blocks tree. Pointers follow RFC 6901 ("/content_blocks/0/heading").
+"""
+import copy
+from typing import Any, List, Tuple
+
+
+class JsonPatchError(ValueError):
+    """The patch is malformed or cannot be applied to the document"""
+
+
+class JsonPatchTestFailed(JsonPatchError):
+    """A "test" operation did not match the document"""
+
+
+def parse_pointer(pointer: str) -> List[str]:
+    """Split an RFC 6901 JSON pointer into unescaped reference tokens"""
+    if not isinstance(pointer, str):
+        raise JsonPatchError(f"Invalid JSON pointer {pointer!r}")
+    if pointer == '':
+        return []
+    if not pointer.startswith('/'):
+        raise JsonPatchError(f"JSON pointer must start with '/': {pointer!r}")
+    return [token.replace('~1', '/').replace('~0', '~') for token in pointer[1:].split('/')]
+
+
+def array_index(container: list, token: str, allow_end: bool = False) -> int:
+    if allow_end and token == '-':
+        return len(container)
+    if not token.isdigit() or (token != '0' and token.startswith('0')):
+        raise JsonPatchError(f"Invalid array index {token!r}")
+    index = int(token)
+    upper = len(container) if allow_end else len(container) - 1
+    if index > upper:
+        raise JsonPatchError(f"Array index {index} out of range")
+    return index
+
+
+def resolve(document: Any, tokens: List[str]) -> Any:
+    """Value referenced by tokens"""
+    value = document
+    for token in tokens:
+        if isinstance(value, dict):
+            if token not in value:
+                raise JsonPatchError(f"Member {token!r} does not exist")
+            value = value[token]
+        elif isinstance(value, list):
+            value = value[array_index(value, token)]
+        else:
+            raise JsonPatchError(f"Cannot reference {token!r} inside a scalar value")
+    return value
+
+
+def resolve_parent(document: Any, pointer: str) -> Tuple[Any, str]:
+    tokens = parse_pointer(pointer)
+    if not tokens:
+        raise JsonPatchError("The document root has no parent")
+    return resolve(document, tokens[:-1]), tokens[-1]
+
+
+def json_equal(left: Any, right: Any) -> bool:
+    """Equality per RFC 6902 "test": booleans never equal numbers, key order is ignored"""
+    if isinstance(left, bool) or isinstance(right, bool):
+        return type(left) is type(right) and left == right
+    if isinstance(left, (int, float)) and isinstance(right, (int, float)):
+        return left == right
+    if type(left) is not type(right):
+        return False
+    if isinstance(left, dict):
+        return left.keys() == right.keys() and all(json_equal(left[key], right[key]) for key in left)
+    if isinstance(left, list):
+        return len(left) == len(right) and all(json_equal(a, b) for a, b in zip(left, right))
+    return left == right
+
+
+def add(document: Any, pointer: str, value: Any) -> Any:
+    if pointer == '':
+        return value
+    parent, token = resolve_parent(document, pointer)
+    if isinstance(parent, dict):
+        parent[token] = value
+    elif isinstance(parent, list):
+        parent.insert(array_index(parent, token, allow_end=True), value)
+    else:
+        raise JsonPatchError(f"Cannot add to a scalar value at {pointer!r}")
+    return document
+
+
+def remove(document: Any, pointer: str) -> Tuple[Any, Any]:
+    """Remove the value at pointer; returns (document, removed value)"""
+    if pointer == '':
+        raise JsonPatchError("Cannot remove the document root")
+    parent, token = resolve_parent(document, pointer)
+    if isinstance(parent, dict):
+        if token not in parent:
+            raise JsonPatchError(f"Member {token!r} does not exist")
+        return document, parent.pop(token)
+    if isinstance(parent, list):
+        return document, parent.pop(array_index(parent, token))
+    raise JsonPatchError(f"Cannot remove from a scalar value at {pointer!r}")
+
+
+def apply_operation(document: Any, operation: dict) -> Any:
+    if not isinstance(operation, dict):
+        raise JsonPatchError(f"Operation must be an object: {operation!r}")
+    op = operation.get('op')
+    path = operation.get('path')
+    if path is None:
+        raise JsonPatchError(f"Operation {op!r} is missing 'path'")
+
+    if op in ('add', 'replace', 'test') and 'value' not in operation:
+        raise JsonPatchError(f"Operation {op!r} is missing 'value'")
+    if op in ('move', 'copy') and 'from' not in operation:
+        raise JsonPatchError(f"Operation {op!r} is missing 'from'")
+
+    if op == 'add':
+        return add(document, path, copy.deepcopy(operation['value']))
+    if op == 'remove':
+        document, _ = remove(document, path)
+        return document
+    if op == 'replace':
+        value = copy.deepcopy(operation['value'])
+        if path == '':
+            return value
+        resolve(document, parse_pointer(path))
+        document, _ = remove(document, path)
+        return add(document, path, value)
+    if op == 'move':
+        source = operation['from']
+        if path != source and path.startswith(source + '/'):
+            raise JsonPatchError(f"Cannot move {source!r} into one of its children")
+        document, value = remove(document, source)
+        return add(document, path, value)
+    if op == 'copy':
+        value = copy.deepcopy(resolve(document, parse_pointer(operation['from'])))
+        return add(document, path, value)
+    if op == 'test':
+        if not json_equal(resolve(document, parse_pointer(path)), operation['value']):
+            raise JsonPatchTestFailed(f"Test failed at {path!r}")
+        return document
+    raise JsonPatchError(f"Unknown operation {op!r}")
+
+
+def apply_patch(document: Any, patch: List[dict]) -> Any:
+    """
+    Apply a JSON Patch and return the patched copy of document
+    The input is left untouched; any failing operation aborts the whole patch.
+    """
+    if not isinstance(patch, list):
+        raise JsonPatchError("A JSON Patch must be a list of operations")
+    document = copy.deepcopy(document)
+    for operation in patch:
+        document = apply_operation(document, operation)
+    return document
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+from website_builder.history import KEEP_LATEST, RETENTION_DAYS, compact_page_history, pages_needing_compaction
+
+
+class Command(BaseCommand):
+    help = 'Drop old page revisions, keeping the newest ones plus daily snapshots'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--keep', type=int, default=KEEP_LATEST, help='Newest revisions kept per page')
+        parser.add_argument('--days', type=int, default=RETENTION_DAYS, help='Days of daily snapshots kept')
+
+    def handle(self, *args, **options):
+        pages = list(pages_needing_compaction(options['keep']))
+        deleted = 0
+        for page_id in pages:
+            deleted += compact_page_history(page_id, options['keep'], options['days'])
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Compacted {len(pages)} pages ({deleted} revisions removed)')
+        )
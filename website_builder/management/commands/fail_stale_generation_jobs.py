@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from website_builder.jobs import GENERATION_JOB_TIMEOUT, fail_stale_jobs
+
+
+class Command(BaseCommand):
+    help = f'Mark generation jobs queued or running for over {GENERATION_JOB_TIMEOUT}s as failed (run every few minutes from cron)'
+
+    def handle(self, *args, **options):
+        failed = fail_stale_jobs()
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Failed {failed} stale generation jobs')
+        )
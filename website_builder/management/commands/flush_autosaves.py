@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from website_builder.autosave import AUTOSAVE_FLUSH_INTERVAL, dirty_buffers, flush_buffers, flush_due
+
+
+class Command(BaseCommand):
+    help = 'Write buffered editor autosaves that are due (run every minute from cron when Celery is not used)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Flush every buffer, due or not')
+        parser.add_argument('--max-age', type=int, default=AUTOSAVE_FLUSH_INTERVAL,
+                            help='Flush buffers whose oldest change is at least this many seconds old')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            flushed = flush_buffers(dirty_buffers())
+        else:
+            flushed = flush_due(options['max_age'])
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Flushed {flushed} autosave buffers')
+        )
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from website_builder.models import WebsiteProject
+from website_builder.publishing import publish_site
+from website_builder.rendering import render_stats
+
+
+class Command(BaseCommand):
+    help = 'Pre-render published websites into new static versions'
+
+    def add_arguments(self, parser):
+        parser.add_argument('slugs', nargs='*', help='Only pre-render these websites')
+        parser.add_argument('--missing', action='store_true', help='Skip websites that already have a version')
+        parser.add_argument('--stats', action='store_true', help='Print block render timings per block type')
+
+    def handle(self, *args, **options):
+        websites = WebsiteProject.objects.filter(is_published=True)
+        if options['slugs']:
+            websites = websites.filter(slug__in=options['slugs'])
+        if options['missing']:
+            websites = websites.filter(published_version='')
+
+        count = 0
+        for website in websites.iterator():
+            version = publish_site(website)
+            self.stdout.write(f'  {website.slug}: {version}')
+            count += 1
+        self.stdout.write(
+            self.style.SUCCESS(f'✓ Pre-rendered {count} websites')
+        )
+
+        if options['stats']:
+            for block_type, stats in sorted(render_stats().items()):
+                self.stdout.write(
+                    f"  {block_type:<20} renders={stats['renders']:<6} hits={stats['hits']:<6} "
+                    f"avg={stats['avg_ms']:.2f}ms max={stats['max_seconds'] * 1000:.2f}ms"
+                )
@@ -0,0 +1,157 @@
+"""
+Middleware serving published websites on their own domains
+Requests for a WebsiteDomain host (pages, robots.txt and sitemaps) are answered from
+the cached site manifest before sessions, tenants or URL routing are involved.
+Pre-rendered pages are streamed from the default storage, or handed to nginx when
+PUBLISHED_SITES_ACCEL_REDIRECT is set.
+Brotli/gzip variants written at publish time are chosen by Accept-Encoding.
+"""
+import logging
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.http import (
+    FileResponse, HttpResponse, HttpResponseNotAllowed, HttpResponseNotFound, HttpResponsePermanentRedirect,
+)
+from django.utils.cache import patch_vary_headers
+
+from tenants.resolution import DEVELOPMENT_HOSTS
+from .publishing import COMPRESSED_VARIANTS, open_version_file
+from .purging import add_edge_headers
+from .serving import aget_site_manifest, get_site_manifest, invalidate_hosts
+from .sitemaps import robots_response, sitemap_response
+
+logger = logging.getLogger(__name__)
+
+SITE_FILE_PATTERN = re.compile(r'^/(robots\.txt|sitemap\.xml|sitemap-\d+\.xml)$')
+
+
+class PublishedSiteMiddleware:
+    """
+    Routes requests for published website domains to their pre-rendered pages
+    Other hosts pass through to the rest of the middleware chain untouched.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        host = self.get_request_host(request)
+        manifest = None if host in DEVELOPMENT_HOSTS else get_site_manifest(host)
+        if manifest is None:
+            return self.get_response(request)
+        return self.serve(request, host, manifest)
+
+    async def __acall__(self, request):
+        host = self.get_request_host(request)
+        manifest = None if host in DEVELOPMENT_HOSTS else await aget_site_manifest(host)
+        if manifest is None:
+            return await self.get_response(request)
+        return self.serve(request, host, manifest)
+
+    def get_request_host(self, request):
+        """Lower-cased request host without the port"""
+        return request.get_host().lower().split(':')[0]
+
+    def serve(self, request, host, manifest):
+        """Answer a request for a published site from its manifest"""
+        if request.method not in ('GET', 'HEAD'):
+            return HttpResponseNotAllowed(['GET', 'HEAD'])
+
+        path = request.path
+        if SITE_FILE_PATTERN.match(path):
+            return self.serve_site_file(manifest, path[1:])
+
+        slug = path.strip('/') or 'home'
+        page = manifest['pages'].get(slug)
+        if page is None or '/' in slug:
+            return HttpResponseNotFound('Page not found')
+        if slug != 'home' and not path.endswith('/'):
+            return HttpResponsePermanentRedirect(f'{path}/')
+        if slug == 'home' and path != '/':
+            return HttpResponsePermanentRedirect('/')
+
+        if 'html' in page:
+            response = HttpResponse(page['html'])
+        else:
+            response = self.serve_file(request, host, f"{manifest['root']}/{page['file']}")
+            patch_vary_headers(response, ['Accept-Encoding'])
+        if response.status_code == 200:
+            add_edge_headers(response, manifest, page)
+        return response
+
+    def serve_site_file(self, manifest, name):
+        """robots.txt and sitemaps, built from the manifest and tagged with the site key"""
+        if name == 'robots.txt':
+            response = robots_response(manifest)
+        else:
+            response = sitemap_response(manifest, name)
+        if response is None:
+            return HttpResponseNotFound('Page not found')
+        return add_edge_headers(response, manifest)
+
+    def accepted_encodings(self, request):
+        """Content codings the client accepts, ignoring those refused with q=0; * accepts every variant"""
+        encodings = set()
+        refused = set()
+        for item in request.headers.get('Accept-Encoding', '').split(','):
+            coding, *params = [part.strip() for part in item.split(';')]
+            quality = 1.0
+            for param in params:
+                name, _, value = param.partition('=')
+                if name.strip().lower() == 'q':
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            if coding and quality > 0:
+                encodings.add(coding.lower())
+            elif coding:
+                refused.add(coding.lower())
+        if '*' in encodings:
+            encodings.update(encoding for encoding in COMPRESSED_VARIANTS if encoding not in refused)
+        return encodings
+
+    def serve_file(self, request, host, relative_path):
+        """Serve a pre-rendered page without loading it into Python memory"""
+        accel_prefix = getattr(settings, 'PUBLISHED_SITES_ACCEL_REDIRECT', None)
+        if accel_prefix:
+            # nginx picks the .br/.gz variant itself (gzip_static / brotli_static on the internal location)
+            response = HttpResponse(content_type='text/html; charset=utf-8')
+            response['X-Accel-Redirect'] = f"{accel_prefix.rstrip('/')}/{relative_path}"
+            return response
+
+        accepted = self.accepted_encodings(request)
+        for encoding, suffix in COMPRESSED_VARIANTS.items():
+            if encoding in accepted:
+                try:
+                    handle = open_version_file(relative_path + suffix)
+                except OSError:
+                    # Versions published before compression existed only have the HTML
+                    continue
+                response = self.file_response(handle)
+                response['Content-Encoding'] = encoding
+                return response
+
+        try:
+            handle = open_version_file(relative_path)
+        except OSError as e:
+            # The manifest points at a pruned version; recompile it on the next request
+            logger.warning(f"Pre-rendered page {relative_path} for {host} is missing: {e}")
+            invalidate_hosts([host])
+            return HttpResponseNotFound('Page not found')
+        return self.file_response(handle)
+
+    def file_response(self, handle):
+        response = FileResponse(handle, content_type='text/html; charset=utf-8')
+        # Pages are displayed, not downloaded as index.html
+        del response['Content-Disposition']
+        return response
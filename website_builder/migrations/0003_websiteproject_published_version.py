@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-16 22:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website_builder', '0002_websiteproject_business_address_line1_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='websiteproject',
+            name='published_version',
+            field=models.CharField(blank=True, help_text='Pre-rendered version currently served on the live domain', max_length=32),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-16 22:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website_builder', '0003_websiteproject_published_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='websitecontent',
+            name='block_hashes',
+            field=models.JSONField(blank=True, default=list, editable=False),
+        ),
+        migrations.AddField(
+            model_name='websitecontent',
+            name='content_hash',
+            field=models.CharField(blank=True, editable=False, max_length=40),
+        ),
+    ]
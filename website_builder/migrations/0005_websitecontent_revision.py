@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-16 22:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website_builder', '0004_websitecontent_change_hashes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='websitecontent',
+            name='revision',
+            field=models.PositiveIntegerField(default=1, editable=False, help_text='Bumped on every content change; editor patches must name it'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.7 on 2026-10-16 22:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website_builder', '0005_websitecontent_revision'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WebsiteContentRevision',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('revision', models.PositiveIntegerField()),
+                ('is_snapshot', models.BooleanField(default=False)),
+                ('data', models.TextField(help_text='Canonical JSON for snapshots, patch text for deltas')),
+                ('chain_length', models.PositiveIntegerField(default=0, help_text='Deltas since the last snapshot')),
+                ('size', models.PositiveIntegerField(default=0, help_text='Stored bytes')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('page', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='revisions', to='website_builder.websitecontent')),
+            ],
+            options={
+                'ordering': ['page', '-revision'],
+                'unique_together': {('page', 'revision')},
+            },
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.0.7 on 2026-10-17 09:12
+
+from django.db import migrations
+from django.db.models.functions import Lower
+
+
+def lowercase_domain_names(apps, schema_editor):
+    WebsiteDomain = apps.get_model('website_builder', 'WebsiteDomain')
+    WebsiteDomain.objects.exclude(domain_name=Lower('domain_name')).update(domain_name=Lower('domain_name'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('website_builder', '0007_generationjob'),
+    ]
+
+    operations = [
+        migrations.RunPython(lowercase_domain_names, migrations.RunPython.noop),
+    ]
@@ -2,6 +2,8 @@ from django.db import models
 from django.contrib.auth.models import User
 from django.urls import reverse
 from django.utils.text import slugify
+from .jsonpatch import JsonPatchError, apply_patch
+from .rendering import block_hash, json_hash, live_page_url
 import uuid
 
 class WebsiteProject(models.Model):
@@ -65,6 +67,10 @@ class WebsiteProject(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     published_at = models.DateTimeField(null=True, blank=True)
+    published_version = models.CharField(
+        max_length=32, blank=True,
+        help_text="Pre-rendered version currently served on the live domain"
+    )
     
     # Branding & SEO
     brand_colors = models.JSONField(
@@ -151,6 +157,11 @@ class WebsiteDomain(models.Model):
     def __str__(self):
         return f"{self.domain_name} ({self.get_domain_type_display()})"
     
+    def save(self, *args, **kwargs):
+        # Hosts are looked up by exact match on the unique index (see serving.compile_site)
+        self.domain_name = self.domain_name.strip().lower()
+        super().save(*args, **kwargs)
+    
     @property
     def is_subdomain(self):
         return self.domain_type == 'subdomain'
@@ -196,10 +207,29 @@ class WebsiteContent(models.Model):
     is_published = models.BooleanField(default=True)
     sort_order = models.PositiveIntegerField(default=0)
     
+    # Change Tracking (maintained by save)
+    content_hash = models.CharField(max_length=40, blank=True, editable=False)
+    block_hashes = models.JSONField(default=list, blank=True, editable=False)
+    revision = models.PositiveIntegerField(
+        default=1, editable=False,
+        help_text="Bumped on every content change; editor patches must name it"
+    )
+    
     # Timestamps
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    # Fields shown in every page's navigation
+    NAVIGATION_FIELDS = ('page_slug', 'page_title', 'sort_order', 'is_published')
+    # Fields the editor may change through a JSON Patch, with their expected types
+    PATCHABLE_FIELDS = {
+        'page_title': str,
+        'content_blocks': list,
+        'seo_title': str,
+        'seo_description': str,
+        'seo_keywords': str,
+    }
+    
     class Meta:
         unique_together = ['website', 'page_slug']
         ordering = ['sort_order', 'page_title']
@@ -207,16 +237,146 @@ class WebsiteContent(models.Model):
     def __str__(self):
         return f"{self.website.name} - {self.page_title}"
     
-    def get_absolute_url(self):
-        """URL to this page on the live website"""
-        base_url = self.website.get_live_url()
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Deferred fields are missing here and count as changed
+        instance._loaded_navigation = tuple(instance.__dict__.get(field) for field in cls.NAVIGATION_FIELDS)
+        return instance
+    
+    def compute_hashes(self):
+        """Hashes of each block and of everything rendered into this page's own HTML"""
+        block_hashes = [block_hash(block) for block in self.content_blocks or []]
+        content_hash = json_hash({
+            'slug': self.page_slug,
+            'title': self.page_title,
+            'seo_title': self.seo_title,
+            'seo_description': self.seo_description,
+            'seo_keywords': self.seo_keywords,
+            'blocks': block_hashes,
+        })
+        return block_hashes, content_hash
+    
+    def changed_blocks(self):
+        """Indexes of blocks that differ from the last saved version"""
+        saved = self.block_hashes or []
+        current, _ = self.compute_hashes()
+        return [index for index, value in enumerate(current) if index >= len(saved) or saved[index] != value]
+    
+    def patch_document(self):
+        """The editable part of the page as a JSON document, the target of editor patches"""
+        return {field: getattr(self, field) for field in self.PATCHABLE_FIELDS}
+    
+    def apply_patch(self, patch):
+        """
+        Apply an RFC 6902 JSON Patch to patch_document() in memory
+        Raises JsonPatchError if the patch fails or leaves a field with the wrong type
+        """
+        document = apply_patch(self.patch_document(), patch)
+        if not isinstance(document, dict) or set(document) != set(self.PATCHABLE_FIELDS):
+            raise JsonPatchError(f"A page patch must keep exactly the fields {', '.join(self.PATCHABLE_FIELDS)}")
+        for field, expected_type in self.PATCHABLE_FIELDS.items():
+            if not isinstance(document[field], expected_type):
+                raise JsonPatchError(f"{field} must be a {expected_type.__name__}")
+            setattr(self, field, document[field])
+    
+    @property
+    def navigation_changed(self):
+        """Whether the fields shared with other pages' navigation differ from the database"""
+        loaded = getattr(self, '_loaded_navigation', None)
+        return loaded != tuple(getattr(self, field) for field in self.NAVIGATION_FIELDS)
+    
+    def save(self, *args, **kwargs):
+        previous_hash = self.content_hash
+        self.block_hashes, self.content_hash = self.compute_hashes()
+        # Read by website_builder.signals to skip invalidating unchanged pages
+        self.content_changed = self._state.adding or previous_hash != self.content_hash
+        self.nav_changed = self.navigation_changed
+        if self.content_changed and not self._state.adding:
+            self.revision += 1
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = set(update_fields) | {'content_hash', 'block_hashes', 'revision'}
+        super().save(*args, **kwargs)
+        self._loaded_navigation = tuple(getattr(self, field) for field in self.NAVIGATION_FIELDS)
+    
+    def get_absolute_url(self, base_url=None):
+        """
+        URL to this page on the live website
+        Pass the site's live URL as base_url to avoid looking up its domain per page
+        """
+        base_url = base_url or self.website.get_live_url()
         if base_url:
-            if self.page_slug == 'home':
-                return base_url
-            return f"{base_url}{self.page_slug}/"
+            return live_page_url(base_url, self.page_slug)
         return None
 
 
+class WebsiteContentRevision(models.Model):
+    """
+    Stored revision of a page's editable document (see WebsiteContent.patch_document)
+    Periodic full snapshots with diff-match-patch deltas in between; each delta applies
+    to the text of the page's previous stored revision. Managed by website_builder.history
+    """
+    page = models.ForeignKey(WebsiteContent, on_delete=models.CASCADE, related_name='revisions')
+    revision = models.PositiveIntegerField()
+    is_snapshot = models.BooleanField(default=False)
+    data = models.TextField(help_text="Canonical JSON for snapshots, patch text for deltas")
+    chain_length = models.PositiveIntegerField(default=0, help_text="Deltas since the last snapshot")
+    size = models.PositiveIntegerField(default=0, help_text="Stored bytes")
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        unique_together = ['page', 'revision']
+        ordering = ['page', '-revision']
+        
+    def __str__(self):
+        kind = 'snapshot' if self.is_snapshot else 'delta'
+        return f"{self.page_id} r{self.revision} ({kind})"
+
+
+class GenerationJob(models.Model):
+    """
+    Background AI generation of a website's content and pages
+    Run by website_builder.jobs so web workers never wait on the LLM
+    """
+    JOB_KINDS = [
+        ('site', 'Generate Website'),
+        ('pages', 'Generate Default Pages'),
+    ]
+
+    JOB_STATUS = [
+        ('queued', 'Queued'),
+        ('running', 'Generating'),
+        ('succeeded', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='generation_jobs')
+    website = models.ForeignKey(WebsiteProject, on_delete=models.SET_NULL, null=True, blank=True, related_name='generation_jobs')
+    kind = models.CharField(max_length=10, choices=JOB_KINDS, default='site')
+    status = models.CharField(max_length=10, choices=JOB_STATUS, default='queued')
+
+    # Generator input: website_type, business_description, website_name
+    payload = models.JSONField(default=dict)
+    error_message = models.TextField(blank=True)
+
+    # Timestamps
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f"{self.get_kind_display()} for {self.payload.get('website_name', self.website_id)} ({self.status})"
+
+    @property
+    def is_finished(self):
+        return self.status in ('succeeded', 'failed')
+
+
 class DomainOrder(models.Model):
     """
     Tracks domain purchases and payments
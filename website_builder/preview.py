@@ -0,0 +1,92 @@
+"""
+Live preview of websites being edited
+The preview page (live_preview view) renders a page once; afterwards the editor's
+changes reach it over a per-website WebSocket group (see consumers.PreviewConsumer)
+as re-rendered block fragments, so an edit costs one small message instead of a
+page reload. Fragments are read from the same fragment cache as published pages, but
+those rendered for in-progress edits only stay for SITE_PREVIEW_FRAGMENT_TIMEOUT.
+"""
+import logging
+from typing import List
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from .editing import SaveResult
+from .rendering import build_navigation, render_fragments
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_TEMPLATE = 'website_builder/site/live_preview.html'
+
+# Most edited states are never published; keep them out of the fragment cache soon
+PREVIEW_FRAGMENT_TIMEOUT = getattr(settings, 'SITE_PREVIEW_FRAGMENT_TIMEOUT', 300)
+
+# Stands in for a block that failed to render, so fragment indexes match block indexes
+EMPTY_FRAGMENT = '<template></template>'
+
+
+def preview_group(website_id) -> str:
+    return f"preview.{website_id}"
+
+
+def preview_fragments(blocks) -> List[str]:
+    return [html or EMPTY_FRAGMENT for html in render_fragments(blocks, timeout=PREVIEW_FRAGMENT_TIMEOUT)]
+
+
+def blocks_event(slug: str, indexed_blocks, count: int) -> dict:
+    """Group message replacing the given (index, block) pairs of a page"""
+    indexes = [index for index, _ in indexed_blocks]
+    fragments = preview_fragments([block for _, block in indexed_blocks])
+    return {
+        'type': 'preview.blocks',
+        'page': slug,
+        'blocks': [[index, html] for index, html in zip(indexes, fragments)],
+        'count': count,
+    }
+
+
+def saved_changes_events(result: SaveResult) -> List[dict]:
+    """Group messages bringing open previews up to date with a save"""
+    if result.navigation_changed:
+        # Titles appear in every page's navigation
+        return [{'type': 'preview.reload'}]
+    return [
+        blocks_event(slug, [(index, result.blocks[slug][index]) for index in indexes], len(result.blocks[slug]))
+        for slug, indexes in result.changed_pages.items()
+        if slug in result.blocks
+    ]
+
+
+async def apush_saved_changes(website_id, events: List[dict]) -> None:
+    """Send the events of saved_changes_events to the website's open previews"""
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    for event in events:
+        try:
+            await channel_layer.group_send(preview_group(website_id), event)
+        except Exception as e:
+            # Previews are best effort; a save never fails because of them
+            logger.warning(f"Could not push preview update for website {website_id}: {e}")
+
+
+def push_saved_changes(website_id, result: SaveResult) -> None:
+    async_to_sync(apush_saved_changes)(website_id, saved_changes_events(result))
+
+
+def render_preview_page(website, page, pages) -> str:
+    """A page as the live preview shows it: the published layout plus the socket client"""
+    navigation = build_navigation(pages)
+    for item in navigation:
+        item['url'] = f"?page={item['slug']}"
+    return render_to_string(PREVIEW_TEMPLATE, {
+        'website': website,
+        'page': page,
+        'navigation': navigation,
+        'colors': website.brand_colors or {},
+        'blocks_html': mark_safe(''.join(preview_fragments(page.content_blocks or []))),
+    })
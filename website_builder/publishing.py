@@ -0,0 +1,231 @@
+"""
+Static pre-rendering of published websites
+Publishing renders every published page once into a versioned directory of the
+default storage, so every instance serves the same files and they survive redeploys:
+
+    PUBLISHED_SITES_LOCATION/<website id>/<version>/index.html
+    PUBLISHED_SITES_LOCATION/<website id>/<version>/<page slug>/index.html
+    PUBLISHED_SITES_LOCATION/<website id>/<version>/manifest.json
+
+Each HTML file is stored with precompressed .gz and, when the brotli package is
+installed, .br variants next to it. The manifest is written last, so a version is
+complete once it has one. The live site then serves these files; older versions are
+pruned after publishing.
+Pages whose content and site layout are unchanged since the previous version are
+hard-linked (or, on remote storage, copied) from it instead of being rendered again.
+"""
+import gzip
+import json
+import logging
+import os
+import posixpath
+from typing import Iterable, Optional
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.utils import timezone
+
+from .models import WebsiteContent, WebsiteProject
+from .purging import purge_pages, purge_website
+from .rendering import build_navigation, layout_hash, render_page
+
+logger = logging.getLogger(__name__)
+
+PUBLISHED_SITES_LOCATION = getattr(settings, 'PUBLISHED_SITES_LOCATION', 'published_sites')
+PUBLISHED_SITES_KEEP_VERSIONS = getattr(settings, 'PUBLISHED_SITES_KEEP_VERSIONS', 2)
+
+MANIFEST_FILENAME = 'manifest.json'
+
+# Content-Encoding -> file suffix, in order of preference
+COMPRESSED_VARIANTS = {'br': '.br', 'gzip': '.gz'} if brotli else {'gzip': '.gz'}
+
+
+def site_directory(website_id) -> str:
+    """Storage name of a website's versions"""
+    return f'{PUBLISHED_SITES_LOCATION}/{website_id}'
+
+
+def page_file(slug: str) -> str:
+    """Path of a page's HTML file relative to its version directory"""
+    return 'index.html' if slug == 'home' else f'{slug}/index.html'
+
+
+def compress(data: bytes, encoding: str) -> bytes:
+    if encoding == 'br':
+        return brotli.compress(data, quality=11, mode=brotli.MODE_TEXT)
+    # A fixed mtime keeps the output identical for identical pages
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def write_file(name: str, data: bytes) -> None:
+    """Store data under exactly name; storage.save() would rename an existing file"""
+    if default_storage.exists(name):
+        default_storage.delete(name)
+    default_storage.save(name, ContentFile(data))
+
+
+def write_page(name: str, html: str) -> None:
+    """Write a page and its precompressed variants"""
+    data = html.encode('utf-8')
+    write_file(name, data)
+    for encoding, suffix in COMPRESSED_VARIANTS.items():
+        write_file(name + suffix, compress(data, encoding))
+
+
+def link_or_copy(source: str, target: str) -> None:
+    try:
+        source_path, target_path = default_storage.path(source), default_storage.path(target)
+    except NotImplementedError:
+        # Remote storage has no links
+        with default_storage.open(source, 'rb') as handle:
+            write_file(target, handle.read())
+        return
+    os.makedirs(os.path.dirname(target_path), exist_ok=True)
+    try:
+        os.link(source_path, target_path)
+    except OSError:
+        with default_storage.open(source, 'rb') as handle:
+            write_file(target, handle.read())
+
+
+def reuse_page(source: str, target: str) -> bool:
+    """Hard-link (or copy) an unchanged page and its variants from the previous version"""
+    try:
+        link_or_copy(source, target)
+        for suffix in COMPRESSED_VARIANTS.values():
+            link_or_copy(source + suffix, target + suffix)
+    except OSError:
+        return False
+    return True
+
+
+def prerender_website(website) -> str:
+    """
+    Render the published pages of website into a new version directory
+    Only pages whose content hash or the site layout changed are rendered; the
+    layout (branding and navigation) only changes with a title, slug or page order.
+    Returns the version name; the version is complete once its manifest is written
+    """
+    version = timezone.now().strftime('%Y%m%d%H%M%S%f')
+    version_dir = f'{site_directory(website.id)}/{version}'
+
+    pages = list(WebsiteContent.objects.filter(website=website, is_published=True))
+    navigation = build_navigation(pages)
+    layout = layout_hash(website, navigation)
+
+    previous_dir = f'{site_directory(website.id)}/{website.published_version}' if website.published_version else None
+    previous = (load_version_manifest(website.id, website.published_version) or {}) if previous_dir else {}
+
+    manifest = {}
+    rendered = 0
+    for page in pages:
+        block_hashes, content_hash = page.compute_hashes()
+        relative_path = page_file(page.page_slug)
+        name = f'{version_dir}/{relative_path}'
+
+        old = previous.get(page.page_slug, {})
+        unchanged = old.get('content_hash') == content_hash and old.get('layout_hash') == layout
+        if not (unchanged and reuse_page(f"{previous_dir}/{old['file']}", name)):
+            write_page(name, render_page(website, page, navigation, block_hashes))
+            rendered += 1
+        manifest[page.page_slug] = {
+            'id': page.id,
+            'title': page.page_title,
+            'file': relative_path,
+            'updated_at': page.updated_at.timestamp(),
+            'content_hash': content_hash,
+            'layout_hash': layout,
+        }
+    write_file(f'{version_dir}/{MANIFEST_FILENAME}', json.dumps(manifest).encode('utf-8'))
+
+    prune_versions(website.id, current=version)
+    logger.info(
+        f"Pre-rendered {website.name} as version {version} "
+        f"({rendered} pages rendered, {len(pages) - rendered} unchanged)"
+    )
+    return version
+
+
+def publish_site(website, page_ids: Optional[Iterable[int]] = None) -> str:
+    """
+    Pre-render website and point its live domain at the new version
+    page_ids limits the edge purge to those pages, for changes that left the
+    navigation and branding alone; by default the whole site is purged.
+    """
+    website.published_version = prerender_website(website)
+    # Saving invalidates the cached site manifest (see website_builder.signals)
+    website.save(update_fields=['published_version', 'updated_at'])
+    if page_ids is None:
+        purge_website(website.id)
+    else:
+        purge_pages(page_ids)
+    return website.published_version
+
+
+def republish_site(website_id, page_ids: Optional[Iterable[int]] = None) -> Optional[str]:
+    """Publish a new version of a pre-rendered live site after its content changed"""
+    website = WebsiteProject.objects.filter(id=website_id, is_published=True).exclude(published_version='').first()
+    if website is None:
+        return None
+    return publish_site(website, page_ids)
+
+
+def load_version_manifest(website_id, version: str) -> Optional[dict]:
+    """Pages of a pre-rendered version keyed by slug, or None if the version is gone"""
+    try:
+        with default_storage.open(f'{site_directory(website_id)}/{version}/{MANIFEST_FILENAME}', 'rb') as handle:
+            return json.loads(handle.read().decode('utf-8'))
+    except (OSError, ValueError) as e:
+        logger.warning(f"Pre-rendered version {version} of website {website_id} is unavailable: {e}")
+        return None
+
+
+def open_version_file(relative_path: str):
+    """Open a file below PUBLISHED_SITES_LOCATION; raises OSError if it is missing"""
+    return default_storage.open(f'{PUBLISHED_SITES_LOCATION}/{relative_path}', 'rb')
+
+
+def delete_tree(name: str) -> None:
+    """Delete a storage directory and everything below it"""
+    try:
+        directories, files = default_storage.listdir(name)
+    except (OSError, NotImplementedError):
+        return
+    for directory in directories:
+        delete_tree(posixpath.join(name, directory))
+    for file_name in files:
+        default_storage.delete(posixpath.join(name, file_name))
+    try:
+        # Only local storage has empty directories left behind
+        os.rmdir(default_storage.path(name))
+    except (OSError, NotImplementedError):
+        pass
+
+
+def prune_versions(website_id, keep: int = PUBLISHED_SITES_KEEP_VERSIONS, current: Optional[str] = None) -> None:
+    """
+    Remove all but the newest keep versions
+    The previous version is kept by default so workers still serving a stale
+    manifest do not hit missing files while the new one propagates.
+    """
+    try:
+        versions, _ = default_storage.listdir(site_directory(website_id))
+    except (OSError, NotImplementedError):
+        return
+    # Versions are timestamps, so newer ones may still be being written by another publish
+    versions = sorted(version for version in versions if version != current)
+    if current:
+        keep -= 1
+    for version in versions[:-keep] if keep > 0 else versions:
+        delete_tree(f'{site_directory(website_id)}/{version}')
+
+
+def remove_website_files(website_id) -> None:
+    """Delete every pre-rendered version of a website"""
+    delete_tree(site_directory(website_id))
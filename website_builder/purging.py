@@ -0,0 +1,147 @@
+"""
+Edge cache headers and purging for published websites
+Live pages carry a long s-maxage and surrogate keys (site:<uuid>, page:<id>, tenant:<id>)
+so a caching proxy can absorb the traffic; changes purge the affected keys after commit.
+
+The backend is chosen by SITE_PURGE_BACKEND:
+    NullPurgeBackend  - only logs (default)
+    LocalPurgeBackend - records purges in-process, as the stand-in endpoint does (tests)
+    HttpPurgeBackend  - POSTs {"keys": [...]} to SITE_PURGE_URL, e.g. a CDN purge proxy
+                        or the local stand-in endpoint website_builder:purge
+Remote purges run on the Celery workers when a broker is configured, so saves never
+wait on the CDN; otherwise they are sent inline with a short SITE_PURGE_TIMEOUT.
+"""
+import logging
+from typing import Iterable, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import patch_cache_control
+from django.utils.module_loading import import_string
+
+logger = logging.getLogger(__name__)
+
+SITE_EDGE_MAX_AGE = getattr(settings, 'SITE_EDGE_MAX_AGE', 30 * 86400)
+SITE_BROWSER_MAX_AGE = getattr(settings, 'SITE_BROWSER_MAX_AGE', 60)
+SURROGATE_KEY_HEADER = getattr(settings, 'SITE_SURROGATE_KEY_HEADER', 'Surrogate-Key')
+
+PURGE_LOG_CACHE_KEY = 'site:purge:log'
+PURGE_LOG_SIZE = 100
+
+
+def site_key(website_id) -> str:
+    return f"site:{website_id}"
+
+
+def page_key(page_id) -> str:
+    return f"page:{page_id}"
+
+
+def tenant_key(tenant_id) -> str:
+    return f"tenant:{tenant_id}"
+
+
+def surrogate_keys(manifest: dict, page: Optional[dict] = None) -> List[str]:
+    """Keys a published page response (or a site-wide file without page) is tagged with"""
+    keys = [site_key(manifest['website_id'])]
+    if page is not None:
+        keys.append(page_key(page['id']))
+    keys.extend(tenant_key(tenant_id) for tenant_id in manifest.get('tenant_ids', []))
+    return keys
+
+
+def add_edge_headers(response, manifest: dict, page: Optional[dict] = None):
+    """Let the edge cache a published page for long and purge it by key"""
+    patch_cache_control(response, public=True, max_age=SITE_BROWSER_MAX_AGE, s_maxage=SITE_EDGE_MAX_AGE)
+    response[SURROGATE_KEY_HEADER] = ' '.join(surrogate_keys(manifest, page))
+    return response
+
+
+class NullPurgeBackend:
+    """Purges nothing; used when no edge cache is configured"""
+
+    def purge(self, keys: List[str]) -> None:
+        logger.debug(f"Edge purge skipped for {' '.join(keys)}")
+
+
+class LocalPurgeBackend:
+    """Records purges where the local stand-in endpoint lists them, without HTTP"""
+
+    def purge(self, keys: List[str]) -> None:
+        record_purge(keys)
+
+
+class HttpPurgeBackend:
+    """Sends purge requests to an HTTP endpoint"""
+
+    remote = True
+
+    def __init__(self, url=None, token=None, timeout=None):
+        self.url = url or getattr(settings, 'SITE_PURGE_URL', None)
+        self.token = token or getattr(settings, 'SITE_PURGE_TOKEN', None)
+        self.timeout = timeout or getattr(settings, 'SITE_PURGE_TIMEOUT', 1)
+
+    def purge(self, keys: List[str]) -> None:
+        if not self.url:
+            logger.warning("SITE_PURGE_URL is not set; edge purge skipped")
+            return
+        import requests
+
+        headers = {'Authorization': f'Bearer {self.token}'} if self.token else {}
+        try:
+            response = requests.post(self.url, json={'keys': keys}, headers=headers, timeout=self.timeout)
+            response.raise_for_status()
+        except Exception as e:
+            # The edge entries still expire after SITE_EDGE_MAX_AGE
+            logger.error(f"Edge purge of {' '.join(keys)} failed: {e}")
+
+
+_backend = None
+
+
+def get_purge_backend():
+    global _backend
+    if _backend is None:
+        backend_path = getattr(settings, 'SITE_PURGE_BACKEND', 'website_builder.purging.NullPurgeBackend')
+        _backend = import_string(backend_path)()
+    return _backend
+
+
+def send_purge(keys: List[str]) -> None:
+    """Hand a purge to the Celery workers when it would otherwise block the request"""
+    backend = get_purge_backend()
+    if getattr(backend, 'remote', False) and getattr(settings, 'CELERY_BROKER_URL', None):
+        from .tasks import purge_edge_keys
+        try:
+            purge_edge_keys.delay(keys)
+            return
+        except Exception as e:
+            logger.error(f"Could not queue edge purge of {' '.join(keys)}: {e}")
+    backend.purge(keys)
+
+
+def purge_keys(keys: Iterable[str]) -> None:
+    """Purge surrogate keys once the current transaction commits"""
+    keys = sorted(set(keys))
+    if keys:
+        transaction.on_commit(lambda: send_purge(keys))
+
+
+def purge_website(website_id) -> None:
+    purge_keys([site_key(website_id)])
+
+
+def purge_pages(page_ids: Iterable[int]) -> None:
+    purge_keys(page_key(page_id) for page_id in page_ids)
+
+
+def record_purge(keys: List[str]) -> None:
+    """Remember purged keys for the local stand-in endpoint"""
+    log = cache.get(PURGE_LOG_CACHE_KEY, [])
+    log = (log + [keys])[-PURGE_LOG_SIZE:]
+    cache.set(PURGE_LOG_CACHE_KEY, log, None)
+
+
+def recent_purges() -> List[List[str]]:
+    return cache.get(PURGE_LOG_CACHE_KEY, [])
@@ -0,0 +1,214 @@
+"""
+Rendering of published website pages
+Turns WebsiteContent blocks into HTML using the templates under website_builder/site/
+Each block type's template is compiled once per process, and rendered fragments are
+cached under a hash of the block's JSON so identical blocks render once across pages and sites.
+"""
+import hashlib
+import json
+import logging
+import threading
+import time
+from typing import Dict, List, Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string, select_template
+from django.utils.safestring import mark_safe
+
+logger = logging.getLogger(__name__)
+
+BLOCK_TEMPLATE_DIR = 'website_builder/site/blocks'
+PAGE_TEMPLATE = 'website_builder/site/page.html'
+BLOCK_CACHE_TIMEOUT = getattr(settings, 'SITE_BLOCK_CACHE_TIMEOUT', 7 * 86400)
+
+# Block types with their own template; anything else renders with generic.html
+BLOCK_TYPES = frozenset({
+    'hero', 'about', 'services', 'contact', 'page_header', 'text_image',
+    'team', 'services_detailed', 'cta', 'contact_full', 'features',
+})
+
+
+class BlockRenderStats:
+    """Per block type counters: renders, fragment cache hits and render time"""
+
+    def __init__(self):
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def _entry(self, block_type: str) -> dict:
+        return self._stats.setdefault(block_type, {'renders': 0, 'hits': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+
+    def record_render(self, block_type: str, seconds: float) -> None:
+        with self._lock:
+            entry = self._entry(block_type)
+            entry['renders'] += 1
+            entry['seconds'] += seconds
+            entry['max_seconds'] = max(entry['max_seconds'], seconds)
+
+    def record_hit(self, block_type: str) -> None:
+        with self._lock:
+            self._entry(block_type)['hits'] += 1
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                block_type: dict(entry, avg_ms=entry['seconds'] * 1000 / entry['renders'] if entry['renders'] else 0.0)
+                for block_type, entry in self._stats.items()
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._stats.clear()
+
+
+block_render_stats = BlockRenderStats()
+_block_templates = {}
+_block_templates_lock = threading.Lock()
+
+
+def render_stats() -> Dict[str, dict]:
+    """Block render counters of this process, keyed by block type"""
+    return block_render_stats.snapshot()
+
+
+def page_url(slug: str) -> str:
+    """Site-relative URL of a page; the home page lives at the site root"""
+    return '/' if slug == 'home' else f'/{slug}/'
+
+
+def live_page_url(base_url: str, slug: str) -> str:
+    """Absolute URL of a page given its site's live URL (ending in a slash)"""
+    return f"{base_url.rstrip('/')}{page_url(slug)}"
+
+
+def build_navigation(pages) -> List[dict]:
+    """Navigation entries for the published pages, in display order"""
+    return [
+        {'slug': page.page_slug, 'title': page.page_title, 'url': page_url(page.page_slug)}
+        for page in pages
+    ]
+
+
+def block_template_type(block: dict) -> str:
+    """
+    Template name of a block
+    The type comes from editor and AI input, so only known types become template
+    paths (and cache and stats keys); the rest map to 'generic'.
+    """
+    block_type = block.get('type')
+    return block_type if isinstance(block_type, str) and block_type in BLOCK_TYPES else 'generic'
+
+
+def get_block_template(block_type: str):
+    """
+    Compiled template for a block type from block_template_type()
+    Returns (template, fingerprint); the fingerprint changes with the template source
+    """
+    if block_type not in BLOCK_TYPES:
+        block_type = 'generic'
+    compiled = _block_templates.get(block_type)
+    if compiled is None:
+        template = select_template([
+            f'{BLOCK_TEMPLATE_DIR}/{block_type}.html',
+            f'{BLOCK_TEMPLATE_DIR}/generic.html',
+        ])
+        source = getattr(getattr(template, 'template', None), 'source', '')
+        compiled = (template, hashlib.sha1(source.encode()).hexdigest()[:12])
+        with _block_templates_lock:
+            _block_templates[block_type] = compiled
+    return compiled
+
+
+def json_hash(value) -> str:
+    """Stable sha1 of a JSON-serialisable value"""
+    canonical = json.dumps(value, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def block_hash(block: dict) -> str:
+    """Stable hash of a block's canonical JSON"""
+    return json_hash(block)
+
+
+def layout_hash(website, navigation: List[dict]) -> str:
+    """Hash of the parts shared by every page of a site: branding and navigation"""
+    return json_hash({
+        'name': website.name,
+        'logo_url': website.logo_url,
+        'favicon_url': website.favicon_url,
+        'brand_colors': website.brand_colors,
+        'navigation': navigation,
+    })
+
+
+def fragment_cache_key(block: dict, digest: Optional[str] = None) -> str:
+    block_type = block_template_type(block)
+    _, fingerprint = get_block_template(block_type)
+    return f"site:block:{block_type}:{fingerprint}:{digest or block_hash(block)}"
+
+
+def _render_fragment(block: dict) -> Optional[str]:
+    block_type = block_template_type(block)
+    template, _ = get_block_template(block_type)
+    started = time.perf_counter()
+    try:
+        return template.render({'block': block})
+    except Exception as e:
+        logger.error(f"Could not render {block_type} block: {e}")
+        return None
+    finally:
+        block_render_stats.record_render(block_type, time.perf_counter() - started)
+
+
+def render_fragments(blocks, hashes: Optional[List[str]] = None, timeout: int = BLOCK_CACHE_TIMEOUT) -> List[str]:
+    """
+    Render a list of blocks with one cache round trip for all their fragments
+    Returns one HTML fragment per block, '' for blocks that are invalid or failed.
+    Only blocks missing from the fragment cache are rendered, each distinct block once.
+    hashes may carry the stored WebsiteContent.block_hashes to skip rehashing;
+    timeout is how long newly rendered fragments stay cached.
+    """
+    if hashes is None or len(hashes) != len(blocks):
+        hashes = [None] * len(blocks)
+    keys = [
+        fragment_cache_key(block, digest) if isinstance(block, dict) else None
+        for block, digest in zip(blocks, hashes)
+    ]
+    fragments = cache.get_many({key for key in keys if key})
+
+    rendered = {}
+    for key, block in zip(keys, blocks):
+        if key is None:
+            continue
+        if key in fragments:
+            block_render_stats.record_hit(block_template_type(block))
+        elif key not in rendered:
+            rendered[key] = _render_fragment(block)
+    # Failed blocks render as empty and are retried next time
+    successful = {key: html for key, html in rendered.items() if html is not None}
+    if successful:
+        cache.set_many(successful, timeout)
+    fragments.update(successful)
+    return [fragments.get(key, '') if key else '' for key in keys]
+
+
+def render_blocks(blocks, hashes: Optional[List[str]] = None) -> str:
+    """Render a list of blocks into one HTML string (see render_fragments)"""
+    return ''.join(render_fragments(blocks, hashes))
+
+
+def render_block(block: dict) -> str:
+    """Render one content block through the fragment cache"""
+    return render_blocks([block])
+
+
+def render_page(website, page, navigation: List[dict], block_hashes: Optional[List[str]] = None) -> str:
+    """Render a complete page of a published website"""
+    return render_to_string(PAGE_TEMPLATE, {
+        'website': website,
+        'page': page,
+        'navigation': navigation,
+        'colors': website.brand_colors or {},
+        'blocks_html': mark_safe(render_blocks(page.content_blocks or [], block_hashes)),
+    })
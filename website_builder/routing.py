@@ -0,0 +1,10 @@
+"""
+WebSocket routes of the website builder, mounted by myproject/asgi.py
+"""
+from django.urls import path
+
+from .consumers import PreviewConsumer
+
+websocket_urlpatterns = [
+    path('ws/preview/<uuid:website_id>/', PreviewConsumer.as_asgi()),
+]
@@ -4,9 +4,13 @@ Handles AI-powered website creation and domain management
 """
 import openai
 import json
+import logging
 import re
 from django.conf import settings
-from typing import Dict, List, Any
+from typing import Dict, Iterator, List, Any
+from .streaming import IncrementalJsonParser, StructureEvent
+
+logger = logging.getLogger(__name__)
 
 
 class AIContentGenerator:
@@ -58,9 +62,74 @@ class AIContentGenerator:
             return self._enhance_generated_content(generated_data, website_type)
             
         except Exception as e:
-            print(f"AI generation failed: {e}")
+            logger.warning(f"AI generation failed: {e}")
             return self._generate_template_based(website_type, business_description, website_name)
     
+    def stream_website_structure(self, website_type: str, business_description: str, website_name: str) -> Iterator[StructureEvent]:
+        """
+        Streaming counterpart of generate_website_structure
+        Yields each top-level field, page and content block as soon as the model has
+        written it, then a final 'done' event carrying the complete enhanced structure.
+        If the model fails midway, a 'reset' event discards what was streamed and the
+        template-based structure follows.
+        """
+        if not self.api_key:
+            yield from self._structure_events(self._generate_template_based(website_type, business_description, website_name))
+            return
+        
+        text = ''
+        generated_data = None
+        try:
+            prompt = self._build_generation_prompt(website_type, business_description, website_name)
+            
+            from openai import OpenAI
+            client = OpenAI(api_key=self.api_key)
+            
+            stream = client.chat.completions.create(
+                model="gpt-3.5-turbo",
+                messages=[
+                    {"role": "system", "content": "You are a professional web designer and copywriter. Generate complete website structures in JSON format."},
+                    {"role": "user", "content": prompt}
+                ],
+                max_tokens=2000,
+                temperature=0.7,
+                stream=True
+            )
+            
+            parser = IncrementalJsonParser()
+            for chunk in stream:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if not delta:
+                    continue
+                text += delta
+                for event in parser.feed(delta):
+                    if event.kind == 'done':
+                        generated_data = event.value
+                    else:
+                        yield event
+        except Exception:
+            logger.exception(f"AI generation of {website_name!r} failed after {len(text)} characters")
+            if text:
+                yield StructureEvent('reset', [], None)
+            yield from self._structure_events(self._generate_template_based(website_type, business_description, website_name))
+            return
+        
+        if not isinstance(generated_data, dict):
+            # Fallback if AI doesn't return valid JSON
+            generated_data = self._parse_ai_text_response(text)
+        yield StructureEvent('done', [], self._enhance_generated_content(generated_data, website_type))
+    
+    def _structure_events(self, content: Dict[str, Any]) -> Iterator[StructureEvent]:
+        """The events stream_website_structure would produce for an already complete structure"""
+        for key, value in content.items():
+            if key != 'pages':
+                yield StructureEvent('field', [key], value)
+        for page_index, page in enumerate(content.get('pages', [])):
+            for block_index, block in enumerate(page.get('content_blocks', [])):
+                yield StructureEvent('block', ['pages', page_index, 'content_blocks', block_index], block)
+            yield StructureEvent('page', ['pages', page_index], page)
+        yield StructureEvent('done', [], content)
+    
     def _build_generation_prompt(self, website_type: str, business_description: str, website_name: str) -> str:
         """Build the AI prompt for website generation"""
         
@@ -0,0 +1,134 @@
+"""
+Live serving engine for published websites
+Each host maps to a cached manifest (page slug -> pre-rendered file), so serving a
+page costs a single cache lookup and no ORM access or template rendering.
+Sites published before pre-rendering existed, or whose version files are missing, are
+rendered into the manifest instead.
+Invalidation reaches every worker through the shared cache (REDIS_URL); without one,
+SITE_MANIFEST_CACHE_TIMEOUT is short so a republish shows up everywhere within a minute.
+"""
+import logging
+from typing import Iterable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+
+from tenants.models import TenantUser
+from tenants.resolution import aresolve_host, negative_cache, resolve_host
+from .models import WebsiteContent, WebsiteDomain
+from .publishing import load_version_manifest
+from .rendering import build_navigation, json_hash, render_page
+
+logger = logging.getLogger(__name__)
+
+SITE_MANIFEST_CACHE_TIMEOUT = getattr(settings, 'SITE_MANIFEST_CACHE_TIMEOUT', 86400)
+SITE_MANIFEST_MISS_TIMEOUT = getattr(settings, 'SITE_MANIFEST_MISS_TIMEOUT', 60)
+
+# Cached for hosts that are not published sites so they skip the database too
+NO_SITE = {}
+
+
+def manifest_cache_key(host: str) -> str:
+    return f"site:manifest:{host.lower()}"
+
+
+def compile_site(host: str) -> Optional[dict]:
+    """
+    Build the manifest of the site served at host
+    Returns None when no active domain with a published website matches
+    """
+    domain = (
+        WebsiteDomain.objects
+        .select_related('website')
+        .filter(domain_name=host.lower(), is_active=True, website__is_published=True)
+        .first()
+    )
+    if domain is None:
+        return None
+
+    website = domain.website
+    # Tags responses with the owner's tenants for edge purging (see website_builder.purging)
+    tenant_ids = list(TenantUser.objects.filter(user_id=website.user_id).values_list('tenant_id', flat=True))
+    if website.published_version:
+        version_pages = load_version_manifest(website.id, website.published_version)
+        if version_pages is not None:
+            return {
+                'website_id': str(website.id),
+                'name': website.name,
+                'tenant_ids': tenant_ids,
+                'base_url': website.get_live_url(),
+                'version': website.published_version,
+                'root': f'{website.id}/{website.published_version}',
+                'pages': version_pages,
+            }
+        # The version's files are gone (e.g. a fresh disk); serve rendered pages until it is republished
+        logger.warning(f"Rendering {website.name} for {host}: version {website.published_version} is missing")
+
+    pages = list(WebsiteContent.objects.filter(website=website, is_published=True))
+    navigation = build_navigation(pages)
+
+    manifest = {
+        'website_id': str(website.id),
+        'name': website.name,
+        'tenant_ids': tenant_ids,
+        'base_url': website.get_live_url(),
+        # Changes whenever a page is added, removed or edited
+        'version': json_hash([website.updated_at] + [(page.page_slug, page.updated_at) for page in pages]),
+        'pages': {},
+    }
+    for page in pages:
+        manifest['pages'][page.page_slug] = {
+            'id': page.id,
+            'title': page.page_title,
+            'html': render_page(website, page, navigation),
+            'updated_at': page.updated_at.timestamp(),
+        }
+    logger.info(f"Compiled {len(pages)} pages of {website.name} for {host}")
+    return manifest
+
+
+def get_site_manifest(host: str) -> Optional[dict]:
+    """
+    Manifest of the site published at host, or None if the host serves no site
+    Hosts in the tenant negative cache are neither sites nor tenants and cost nothing.
+    A miss is only cached for tenant hosts; unknown hosts go to the bounded negative
+    cache through the tenant lookup instead of filling the shared cache.
+    """
+    if host in negative_cache:
+        return None
+    key = manifest_cache_key(host)
+    manifest = cache.get(key)
+    if manifest is None:
+        manifest = compile_site(host)
+        if manifest is not None:
+            cache.set(key, manifest, SITE_MANIFEST_CACHE_TIMEOUT)
+        elif resolve_host(host) is not None:
+            cache.set(key, NO_SITE, SITE_MANIFEST_MISS_TIMEOUT)
+    return manifest or None
+
+
+async def aget_site_manifest(host: str) -> Optional[dict]:
+    """Async counterpart of get_site_manifest; only a cold host compiles in a thread"""
+    if host in negative_cache:
+        return None
+    key = manifest_cache_key(host)
+    manifest = await cache.aget(key)
+    if manifest is None:
+        manifest = await sync_to_async(compile_site)(host)
+        if manifest is not None:
+            await cache.aset(key, manifest, SITE_MANIFEST_CACHE_TIMEOUT)
+        elif await aresolve_host(host) is not None:
+            await cache.aset(key, NO_SITE, SITE_MANIFEST_MISS_TIMEOUT)
+    return manifest or None
+
+
+def invalidate_hosts(hosts: Iterable[str]) -> None:
+    """Drop the cached manifests of hosts; they are recompiled on the next request"""
+    cache.delete_many([manifest_cache_key(host) for host in hosts if host])
+
+
+def invalidate_website(website_id) -> None:
+    """Drop the cached manifest of a website after its content or settings changed"""
+    hosts = WebsiteDomain.objects.filter(website_id=website_id).values_list('domain_name', flat=True)
+    invalidate_hosts(hosts)
@@ -0,0 +1,76 @@
+"""
+Signal handlers that drop cached site manifests when published content changes
+"""
+from django.contrib.auth.signals import user_logged_out
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from tenants.bus import invalidation_bus
+
+from .autosave import flush_user_buffers
+from .models import WebsiteContent, WebsiteDomain, WebsiteProject
+from .history import record_revisions
+from .publishing import remove_website_files
+from .purging import purge_website
+from .serving import invalidate_hosts, invalidate_website
+
+
+@receiver(post_save, sender=WebsiteProject)
+@receiver(post_delete, sender=WebsiteProject)
+def invalidate_project_site(sender, instance, **kwargs):
+    """Name, branding and publish state are compiled into every page"""
+    website_id = instance.id
+    transaction.on_commit(lambda: invalidate_website(website_id))
+
+
+@receiver(post_save, sender=WebsiteContent)
+@receiver(post_delete, sender=WebsiteContent)
+def invalidate_content_site(sender, instance, signal=None, **kwargs):
+    """Saves that change neither the page's HTML nor the navigation keep the cache"""
+    if signal is post_save:
+        if not (getattr(instance, 'content_changed', True) or getattr(instance, 'nav_changed', True)):
+            return
+    website_id = instance.website_id
+    transaction.on_commit(lambda: invalidate_website(website_id))
+
+
+@receiver(pre_save, sender=WebsiteDomain)
+def remember_previous_domain(sender, instance, raw=False, **kwargs):
+    """Keep the old host so its manifest can be dropped after a rename"""
+    instance._previous_domain_name = None
+    if instance.pk and not raw:
+        instance._previous_domain_name = (
+            WebsiteDomain.objects.filter(pk=instance.pk).values_list('domain_name', flat=True).first()
+        )
+
+
+@receiver(post_save, sender=WebsiteDomain)
+@receiver(post_delete, sender=WebsiteDomain)
+def invalidate_domain_site(sender, instance, **kwargs):
+    hosts = [instance.domain_name, getattr(instance, '_previous_domain_name', None)]
+    transaction.on_commit(lambda: invalidate_hosts(hosts))
+    # A newly active host may be remembered as unknown by every worker
+    transaction.on_commit(lambda: invalidation_bus.publish(hosts=[host for host in hosts if host]))
+    # Pages cached at the edge under the old or deactivated host
+    purge_website(instance.website_id)
+
+
+@receiver(post_delete, sender=WebsiteProject)
+def remove_prerendered_site(sender, instance, **kwargs):
+    website_id = instance.id
+    transaction.on_commit(lambda: remove_website_files(website_id))
+
+
+@receiver(post_save, sender=WebsiteContent)
+def record_content_revision(sender, instance, raw=False, **kwargs):
+    """Editor saves record their own deltas in bulk; other saves store a snapshot"""
+    if not raw and getattr(instance, 'content_changed', False):
+        record_revisions([(instance, None, None)])
+
+
+@receiver(user_logged_out)
+def flush_autosaves_on_logout(sender, user=None, **kwargs):
+    """Logging out ends the editor session; write its buffered changes"""
+    if user is not None:
+        flush_user_buffers(user.id)
@@ -0,0 +1,106 @@
+"""
+sitemap.xml and robots.txt for published websites
+Both are built from the cached site manifest, so crawlers never reach the database.
+Sitemaps are streamed while being generated and then cached per site version; sites
+past the 50,000 URL limit get a sitemap index pointing at /sitemap-<n>.xml parts.
+"""
+from datetime import datetime, timezone
+from typing import Iterator, List, Optional
+from xml.sax.saxutils import escape
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, StreamingHttpResponse
+
+from .rendering import live_page_url
+
+SITEMAP_MAX_URLS = 50000
+SITEMAP_CACHE_TIMEOUT = getattr(settings, 'SITE_MANIFEST_CACHE_TIMEOUT', 86400)
+SITEMAP_CONTENT_TYPE = 'application/xml; charset=utf-8'
+
+XML_HEADER = '<?xml version="1.0" encoding="UTF-8"?>\n'
+SITEMAP_NS = 'http://www.sitemaps.org/schemas/sitemap/0.9'
+
+
+def sitemap_cache_key(manifest: dict, name: str) -> str:
+    """Keyed by the manifest version, so the cache turns over when the site's pages change"""
+    return f"site:sitemap:{manifest['website_id']}:{manifest['version']}:{name}"
+
+
+def format_lastmod(timestamp: Optional[float]) -> str:
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc).strftime('%Y-%m-%dT%H:%M:%S+00:00')
+
+
+def sitemap_parts(manifest: dict) -> int:
+    return max(1, -(-len(manifest['pages']) // SITEMAP_MAX_URLS))
+
+
+def generate_urlset(manifest: dict, part: int = 1) -> Iterator[str]:
+    """Yield the <urlset> of one sitemap part, a URL at a time"""
+    base_url = manifest['base_url']
+    pages = list(manifest['pages'].items())[(part - 1) * SITEMAP_MAX_URLS:part * SITEMAP_MAX_URLS]
+    yield f'{XML_HEADER}<urlset xmlns="{SITEMAP_NS}">\n'
+    for slug, page in pages:
+        entry = f'<url><loc>{escape(live_page_url(base_url, slug))}</loc>'
+        if page.get('updated_at'):
+            entry += f"<lastmod>{format_lastmod(page['updated_at'])}</lastmod>"
+        yield entry + '</url>\n'
+    yield '</urlset>\n'
+
+
+def generate_index(manifest: dict) -> Iterator[str]:
+    """Yield a <sitemapindex> listing every sitemap part"""
+    base_url = manifest['base_url'].rstrip('/')
+    pages = list(manifest['pages'].values())
+    yield f'{XML_HEADER}<sitemapindex xmlns="{SITEMAP_NS}">\n'
+    for part in range(1, sitemap_parts(manifest) + 1):
+        chunk = pages[(part - 1) * SITEMAP_MAX_URLS:part * SITEMAP_MAX_URLS]
+        timestamps = [page['updated_at'] for page in chunk if page.get('updated_at')]
+        entry = f'<sitemap><loc>{escape(base_url)}/sitemap-{part}.xml</loc>'
+        if timestamps:
+            entry += f'<lastmod>{format_lastmod(max(timestamps))}</lastmod>'
+        yield entry + '</sitemap>\n'
+    yield '</sitemapindex>\n'
+
+
+def caching_stream(key: str, chunks: Iterator[str]) -> Iterator[bytes]:
+    """Stream chunks to the client and cache the full document once it is complete"""
+    parts: List[bytes] = []
+    for chunk in chunks:
+        data = chunk.encode('utf-8')
+        parts.append(data)
+        yield data
+    cache.set(key, b''.join(parts), SITEMAP_CACHE_TIMEOUT)
+
+
+def sitemap_response(manifest: dict, name: str):
+    """
+    Response for sitemap.xml or sitemap-<n>.xml, or None if there is no such sitemap
+    sitemap.xml is the urlset itself for small sites and an index for large ones
+    """
+    if not manifest.get('base_url'):
+        return None
+    parts = sitemap_parts(manifest)
+    if name == 'sitemap.xml':
+        generator = generate_index(manifest) if parts > 1 else generate_urlset(manifest)
+    else:
+        try:
+            part = int(name[len('sitemap-'):-len('.xml')])
+        except ValueError:
+            return None
+        if parts == 1 or not 1 <= part <= parts:
+            return None
+        generator = generate_urlset(manifest, part)
+
+    key = sitemap_cache_key(manifest, name)
+    cached = cache.get(key)
+    if cached is not None:
+        return HttpResponse(cached, content_type=SITEMAP_CONTENT_TYPE)
+    return StreamingHttpResponse(caching_stream(key, generator), content_type=SITEMAP_CONTENT_TYPE)
+
+
+def robots_response(manifest: dict):
+    lines = ['User-agent: *', 'Allow: /']
+    if manifest.get('base_url'):
+        lines.append(f"Sitemap: {manifest['base_url'].rstrip('/')}/sitemap.xml")
+    return HttpResponse('\n'.join(lines) + '\n', content_type='text/plain; charset=utf-8')
@@ -0,0 +1,142 @@
+"""
+Incremental parsing of streamed AI website structures
+The LLM returns one JSON document token by token. IncrementalJsonParser is fed the
+chunks as they arrive and reports each top-level field, page and content block as
+soon as its closing token is seen, instead of waiting for the whole completion.
+Text before the first '{' (a preamble or a ``` fence) and after the document is ignored.
+"""
+import json
+from typing import Any, List, Optional
+
+
+class StructureEvent:
+    """A completed part of the website structure"""
+
+    def __init__(self, kind: str, path: list, value: Any):
+        self.kind = kind    # 'field', 'page', 'block', 'reset' or 'done'
+        self.path = path    # ['pages', 0, 'content_blocks', 2] for a block
+        self.value = value
+
+    def __repr__(self):
+        return f"StructureEvent({self.kind!r}, {self.path!r})"
+
+
+def event_kind(path: list) -> Optional[str]:
+    """Which parts of the structure are reported, by their JSON path"""
+    if not path:
+        return 'done'
+    if path == ['pages']:
+        # Reported page by page instead
+        return None
+    if len(path) == 1:
+        return 'field'
+    if path[0] == 'pages' and len(path) == 2:
+        return 'page'
+    if path[0] == 'pages' and len(path) == 4 and path[2] == 'content_blocks':
+        return 'block'
+    return None
+
+
+class IncrementalJsonParser:
+    """
+    Streaming scanner for a single JSON document
+    Tracks the path of the value being read; a value is decoded with json.loads only
+    once it is complete and event_kind() wants it, so each part is parsed once.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.position = 0
+        self.started = False
+        self.finished = False
+        self.stack = []             # Open containers: {'array', 'path', 'start', 'key', 'index', 'expect_key'}
+        self.string_start = None    # Offset of the opening quote of the string being read
+        self.string_is_key = False
+        self.string_path = None
+        self.escaped = False
+        self.scalar_start = None    # Offset of the number or literal being read
+        self.scalar_path = None
+
+    def feed(self, text: str) -> List[StructureEvent]:
+        """Consume a chunk and return the parts it completed"""
+        events = []
+        self.buffer += text
+        while self.position < len(self.buffer) and not self.finished:
+            self.step(self.buffer[self.position], events)
+            self.position += 1
+        return events
+
+    def value_path(self) -> list:
+        """Path of a value starting at the current position"""
+        if not self.stack:
+            return []
+        frame = self.stack[-1]
+        if frame['array']:
+            frame['index'] += 1
+            return frame['path'] + [frame['index']]
+        return frame['path'] + [frame['key']]
+
+    def complete(self, path: list, start: int, end: int, events: list) -> None:
+        kind = event_kind(path)
+        if kind is not None:
+            try:
+                value = json.loads(self.buffer[start:end])
+            except ValueError:
+                return
+            events.append(StructureEvent(kind, path, value))
+        if not path:
+            self.finished = True
+
+    def end_scalar(self, events: list) -> None:
+        if self.scalar_start is not None:
+            self.complete(self.scalar_path, self.scalar_start, self.position, events)
+            self.scalar_start = None
+
+    def step(self, char: str, events: list) -> None:
+        if self.string_start is not None:
+            if self.escaped:
+                self.escaped = False
+            elif char == '\\':
+                self.escaped = True
+            elif char == '"':
+                start, self.string_start = self.string_start, None
+                if self.string_is_key:
+                    self.stack[-1]['key'] = json.loads(self.buffer[start:self.position + 1])
+                    self.stack[-1]['expect_key'] = False
+                else:
+                    self.complete(self.string_path, start, self.position + 1, events)
+            return
+
+        if not self.started:
+            # Skip any preamble before the document
+            if char != '{':
+                return
+            self.started = True
+
+        if self.scalar_start is not None and (char in ',}]' or char.isspace()):
+            self.end_scalar(events)
+
+        if char in '{[':
+            path = self.value_path()
+            self.stack.append({
+                'array': char == '[', 'path': path, 'start': self.position,
+                'key': None, 'index': -1, 'expect_key': char == '{',
+            })
+        elif char in '}]':
+            if self.stack:
+                frame = self.stack.pop()
+                self.complete(frame['path'], frame['start'], self.position + 1, events)
+        elif char == '"':
+            self.string_start = self.position
+            self.string_is_key = bool(self.stack) and not self.stack[-1]['array'] and self.stack[-1]['expect_key']
+            if not self.string_is_key:
+                self.string_path = self.value_path()
+        elif char == ',':
+            if self.stack and not self.stack[-1]['array']:
+                self.stack[-1]['expect_key'] = True
+        elif char == ':' or char.isspace():
+            pass
+        elif self.scalar_start is None:
+            # Number, true, false or null
+            self.scalar_start = self.position
+            self.scalar_path = self.value_path()
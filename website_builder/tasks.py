@@ -0,0 +1,26 @@
+"""
+Celery tasks of the website builder, discovered by myproject/celery.py
+"""
+from celery import shared_task
+
+from .autosave import flush_buffers
+from .jobs import run_job
+from .purging import get_purge_backend
+
+
+@shared_task(ignore_result=True)
+def generate_website(job_id):
+    """Run a GenerationJob on a Celery worker"""
+    run_job(job_id)
+
+
+@shared_task(ignore_result=True)
+def purge_edge_keys(keys):
+    """Send an edge purge from a Celery worker instead of the saving request"""
+    get_purge_backend().purge(keys)
+
+
+@shared_task(ignore_result=True)
+def flush_autosave_buffer(website_id):
+    """Write a website's autosave buffer once AUTOSAVE_FLUSH_INTERVAL has passed"""
+    flush_buffers([website_id])
@@ -0,0 +1,370 @@
+import json
+import shutil
+import tempfile
+
+from asgiref.testing import ApplicationCommunicator
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from .autosave import flush_record, load_record, merge_changes, store_record
+from .consumers import PreviewConsumer
+from .editing import RevisionConflict, save_changes
+from .history import compact_page_history, document_at
+from .jsonpatch import JsonPatchError, JsonPatchTestFailed, apply_patch
+from .models import WebsiteContent, WebsiteContentRevision, WebsiteDomain, WebsiteProject
+from .publishing import publish_site
+
+
+class PreviewSocket:
+    """Drives PreviewConsumer through the ASGI websocket protocol, as a browser would"""
+
+    def __init__(self, website, user):
+        self.communicator = ApplicationCommunicator(PreviewConsumer.as_asgi(), {
+            'type': 'websocket',
+            'path': f'/ws/preview/{website.id}/',
+            'headers': [],
+            'subprotocols': [],
+            'user': user,
+            'url_route': {'args': (), 'kwargs': {'website_id': website.id}},
+        })
+
+    async def connect(self):
+        await self.communicator.send_input({'type': 'websocket.connect'})
+        return await self.communicator.receive_output(timeout=3)
+
+    async def send_json(self, content):
+        await self.communicator.send_input({'type': 'websocket.receive', 'text': json.dumps(content)})
+
+    async def receive_json(self):
+        message = await self.communicator.receive_output(timeout=3)
+        return json.loads(message['text'])
+
+    async def disconnect(self):
+        await self.communicator.send_input({'type': 'websocket.disconnect', 'code': 1000})
+        await self.communicator.wait(timeout=3)
+
+
+class PreviewConsumerTests(TestCase):
+    """Block edits sent by the editor reach every open preview of the website"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', password='secret')
+        cls.other = User.objects.create_user('other', password='secret')
+        cls.website = WebsiteProject.objects.create(user=cls.user, name='Bakery', website_type='restaurant')
+
+    def setUp(self):
+        cache.clear()
+
+    async def test_block_message_is_broadcast_as_rendered_fragment(self):
+        editor = PreviewSocket(self.website, self.user)
+        preview = PreviewSocket(self.website, self.user)
+        self.assertEqual((await editor.connect())['type'], 'websocket.accept')
+        self.assertEqual((await preview.connect())['type'], 'websocket.accept')
+
+        block = {'type': 'hero', 'heading': 'Fresh bread daily', 'subheading': 'Since 1952'}
+        await editor.send_json({'type': 'block', 'page': 'home', 'index': 1, 'block': block, 'count': 3})
+
+        for socket in (preview, editor):
+            message = await socket.receive_json()
+            self.assertEqual(message['type'], 'blocks')
+            self.assertEqual(message['page'], 'home')
+            self.assertEqual(message['count'], 3)
+            [[index, html]] = message['blocks']
+            self.assertEqual(index, 1)
+            self.assertIn('Fresh bread daily', html)
+
+        await editor.disconnect()
+        await preview.disconnect()
+
+    async def test_other_users_cannot_join(self):
+        socket = PreviewSocket(self.website, self.other)
+        message = await socket.connect()
+        self.assertEqual(message['type'], 'websocket.close')
+        self.assertEqual(message['code'], 4403)
+
+
+class JsonPatchTests(SimpleTestCase):
+    """RFC 6902 operations on a page document, as sent by the editor"""
+
+    document = {'content_blocks': [{'type': 'hero', 'heading': 'Welcome'}, {'type': 'text', 'text': 'Hours'}]}
+
+    def test_add(self):
+        patched = apply_patch(self.document, [{'op': 'add', 'path': '/content_blocks/1', 'value': {'type': 'gallery'}}])
+        self.assertEqual([block['type'] for block in patched['content_blocks']], ['hero', 'gallery', 'text'])
+
+    def test_add_to_end_of_array(self):
+        patched = apply_patch(self.document, [{'op': 'add', 'path': '/content_blocks/-', 'value': {'type': 'contact'}}])
+        self.assertEqual(patched['content_blocks'][-1], {'type': 'contact'})
+
+    def test_remove(self):
+        patched = apply_patch(self.document, [{'op': 'remove', 'path': '/content_blocks/0'}])
+        self.assertEqual(patched['content_blocks'], [{'type': 'text', 'text': 'Hours'}])
+
+    def test_replace_field(self):
+        patched = apply_patch(self.document, [{'op': 'replace', 'path': '/content_blocks/0/heading', 'value': 'Hello'}])
+        self.assertEqual(patched['content_blocks'][0]['heading'], 'Hello')
+        self.assertEqual(self.document['content_blocks'][0]['heading'], 'Welcome')
+
+    def test_move(self):
+        patched = apply_patch(self.document, [{'op': 'move', 'from': '/content_blocks/0', 'path': '/content_blocks/1'}])
+        self.assertEqual([block['type'] for block in patched['content_blocks']], ['text', 'hero'])
+
+    def test_copy(self):
+        patched = apply_patch(self.document, [{'op': 'copy', 'from': '/content_blocks/0', 'path': '/content_blocks/-'}])
+        self.assertEqual(patched['content_blocks'][2], patched['content_blocks'][0])
+        self.assertIsNot(patched['content_blocks'][2], patched['content_blocks'][0])
+
+    def test_test(self):
+        operation = {'op': 'test', 'path': '/content_blocks/1/text', 'value': 'Hours'}
+        self.assertEqual(apply_patch(self.document, [operation]), self.document)
+        with self.assertRaises(JsonPatchTestFailed):
+            apply_patch(self.document, [{**operation, 'value': 'Prices'}])
+
+    def test_escaped_tokens(self):
+        document = {'a/b': {'c~d': 1}}
+        patched = apply_patch(document, [{'op': 'replace', 'path': '/a~1b/c~0d', 'value': 2}])
+        self.assertEqual(patched, {'a/b': {'c~d': 2}})
+
+    def test_failed_operation_aborts_patch(self):
+        with self.assertRaises(JsonPatchError):
+            apply_patch(self.document, [
+                {'op': 'remove', 'path': '/content_blocks/0'},
+                {'op': 'remove', 'path': '/content_blocks/5'},
+            ])
+        self.assertEqual(len(self.document['content_blocks']), 2)
+
+
+class SaveChangesTests(TestCase):
+    """The editor save API applies patches against the page's current revision"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', password='secret')
+        cls.website = WebsiteProject.objects.create(user=cls.user, name='Bakery', website_type='restaurant')
+        cls.home = WebsiteContent.objects.create(
+            website=cls.website, page_slug='home', page_type='home', page_title='Home',
+            content_blocks=[{'type': 'hero', 'heading': 'Fresh bread daily'}],
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def save(self, patch, revision=None):
+        return self.client.post(reverse('website_builder:save_changes'), {
+            'website_id': str(self.website.id),
+            'changes': {'content': {'pages': [{
+                'slug': 'home',
+                'revision': self.home.revision if revision is None else revision,
+                'patch': patch,
+            }]}},
+        }, content_type='application/json')
+
+    def test_patch_advances_revision(self):
+        response = self.save([{'op': 'replace', 'path': '/content_blocks/0/heading', 'value': 'Rye'}])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['revisions'], {'home': self.home.revision + 1})
+        self.home.refresh_from_db()
+        self.assertEqual(self.home.content_blocks[0]['heading'], 'Rye')
+
+    def test_stale_revision_conflicts(self):
+        self.save([{'op': 'replace', 'path': '/content_blocks/0/heading', 'value': 'Rye'}])
+        response = self.save([{'op': 'replace', 'path': '/content_blocks/0/heading', 'value': 'Spelt'}])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['conflicts'], {'home': self.home.revision + 1})
+        self.home.refresh_from_db()
+        self.assertEqual(self.home.content_blocks[0]['heading'], 'Rye')
+
+    def test_unknown_field_is_rejected(self):
+        response = self.save([{'op': 'add', 'path': '/sort_order', 'value': 3}])
+        self.assertEqual(response.status_code, 400)
+
+    def test_wrong_type_is_rejected(self):
+        response = self.save([{'op': 'replace', 'path': '/content_blocks', 'value': 'none'}])
+        self.assertEqual(response.status_code, 400)
+        self.home.refresh_from_db()
+        self.assertEqual(self.home.content_blocks[0]['heading'], 'Fresh bread daily')
+
+
+    def page_edits(self, count):
+        """A save patching count pages of a new website"""
+        website = WebsiteProject.objects.create(user=self.user, name=f'Site {count}', website_type='business')
+        pages = WebsiteContent.objects.bulk_create(
+            WebsiteContent(
+                website=website, page_slug=f'page-{n}', page_type='custom', page_title=f'Page {n}',
+                content_blocks=[{'type': 'text', 'text': 'Draft'}],
+            )
+            for n in range(count)
+        )
+        return website, {'content': {'pages': [
+            {
+                'slug': page.page_slug,
+                'revision': page.revision,
+                'patch': [{'op': 'replace', 'path': '/content_blocks/0/text', 'value': 'Final'}],
+            }
+            for page in pages
+        ]}}
+
+    def test_query_count_does_not_grow_with_pages(self):
+        website, changes = self.page_edits(2)
+        with self.captureOnCommitCallbacks(), CaptureQueriesContext(connection) as queries:
+            save_changes(website, changes)
+
+        website, changes = self.page_edits(20)
+        with self.captureOnCommitCallbacks(), self.assertNumQueries(len(queries)):
+            result = save_changes(website, changes)
+        self.assertEqual(len(result.changed_pages), 20)
+
+
+class AutosaveFlushTests(TestCase):
+    """A buffered flush keeps changes saved elsewhere to other parts of the page"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', password='secret')
+        cls.website = WebsiteProject.objects.create(user=cls.user, name='Bakery', website_type='restaurant')
+
+    def setUp(self):
+        cache.clear()
+        self.page = WebsiteContent.objects.create(
+            website=self.website, page_slug='home', page_type='home', page_title='Home',
+            content_blocks=[{'type': 'hero', 'heading': 'Fresh bread daily', 'subheading': 'Since 1952'}],
+        )
+
+    def buffer(self, path, value):
+        record = load_record(self.website)
+        merge_changes(record, self.website, {'content': {'pages': [{
+            'slug': 'home',
+            'revision': self.page.revision,
+            'patch': [{'op': 'replace', 'path': path, 'value': value}],
+        }]}}, {'home': self.page})
+        store_record(record)
+        return record
+
+    def save_elsewhere(self, path, value):
+        save_changes(self.website, {'content': {'pages': [{
+            'slug': 'home',
+            'revision': self.page.revision,
+            'patch': [{'op': 'replace', 'path': path, 'value': value}],
+        }]}})
+
+    def test_other_fields_are_kept(self):
+        record = self.buffer('/content_blocks/0/heading', 'Rye today')
+        self.save_elsewhere('/content_blocks/0/subheading', 'Since 1953')
+        flush_record(self.website, record)
+        self.page.refresh_from_db()
+        self.assertEqual(self.page.content_blocks[0], {
+            'type': 'hero', 'heading': 'Rye today', 'subheading': 'Since 1953',
+        })
+
+    def test_same_field_conflicts(self):
+        record = self.buffer('/content_blocks/0/heading', 'Rye today')
+        self.save_elsewhere('/content_blocks/0/heading', 'Spelt today')
+        with self.assertRaises(RevisionConflict) as context:
+            flush_record(self.website, record)
+        self.page.refresh_from_db()
+        self.assertEqual(context.exception.conflicts, {'home': self.page.revision})
+        self.assertEqual(self.page.content_blocks[0]['heading'], 'Spelt today')
+        self.assertEqual(load_record(self.website)['pages'], {})
+
+
+class RevisionHistoryTests(TestCase):
+    """Every stored revision reconstructs to the document that was saved"""
+
+    @classmethod
+    def setUpTestData(cls):
+        user = User.objects.create_user('owner', password='secret')
+        cls.website = WebsiteProject.objects.create(user=user, name='Bakery', website_type='restaurant')
+
+    def setUp(self):
+        self.page = WebsiteContent.objects.create(
+            website=self.website, page_slug='home', page_type='home', page_title='Home',
+            content_blocks=[{'type': 'text', 'heading': f'Section {n}', 'text': 'Bread ' * 40} for n in range(5)],
+        )
+        self.documents = {self.page.revision: self.page.patch_document()}
+
+    def edit(self, count):
+        for n in range(count):
+            save_changes(self.website, {'content': {'pages': [{
+                'slug': 'home',
+                'revision': self.page.revision,
+                'patch': [{'op': 'replace', 'path': f'/content_blocks/{n % 5}/heading', 'value': f'Edit {n}'}],
+            }]}})
+            self.page.refresh_from_db()
+            self.documents[self.page.revision] = self.page.patch_document()
+
+    def test_documents_survive_compaction(self):
+        self.edit(60)
+        revisions = WebsiteContentRevision.objects.filter(page=self.page)
+        self.assertGreater(revisions.filter(is_snapshot=False).count(), 0)
+        self.assertGreater(revisions.filter(is_snapshot=True).count(), 1)
+        for revision, document in self.documents.items():
+            self.assertEqual(document_at(self.page.id, revision), document, f'revision {revision}')
+
+        deleted = compact_page_history(self.page.id, keep_latest=20)
+        self.assertGreater(deleted, 0)
+        kept = set(revisions.values_list('revision', flat=True))
+        self.assertTrue(set(sorted(self.documents)[-20:]) <= kept)
+        for revision, document in self.documents.items():
+            expected = document if revision in kept else None
+            self.assertEqual(document_at(self.page.id, revision), expected, f'revision {revision}')
+
+        self.edit(5)
+        self.assertEqual(document_at(self.page.id, self.page.revision), self.documents[self.page.revision])
+
+
+class PublishedSiteTests(TestCase):
+    """Editor saves to a live site are served from its next pre-rendered version"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('owner', password='secret')
+        cls.website = WebsiteProject.objects.create(
+            user=cls.user, name='Bakery', website_type='restaurant', is_published=True
+        )
+        cls.home = WebsiteContent.objects.create(
+            website=cls.website, page_slug='home', page_type='home', page_title='Home', is_published=True,
+            content_blocks=[{'type': 'hero', 'heading': 'Fresh bread daily'}],
+        )
+        WebsiteDomain.objects.create(website=cls.website, domain_name='bakery.example', is_active=True)
+
+    def setUp(self):
+        cache.clear()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        settings_override = override_settings(MEDIA_ROOT=media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+        publish_site(self.website)
+        self.client.force_login(self.user)
+
+    def get_home(self):
+        response = self.client.get('/', HTTP_HOST='bakery.example')
+        self.assertEqual(response.status_code, 200)
+        return b''.join(response.streaming_content).decode()
+
+    def test_save_is_served_from_new_version(self):
+        self.assertIn('Fresh bread daily', self.get_home())
+        version = self.website.published_version
+
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('website_builder:save_changes'), {
+                'website_id': str(self.website.id),
+                'changes': {'content': {'pages': [{
+                    'slug': 'home',
+                    'revision': self.home.revision,
+                    'patch': [{'op': 'replace', 'path': '/content_blocks/0/heading', 'value': 'Rye on Sundays'}],
+                }]}},
+            }, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+
+        self.website.refresh_from_db()
+        self.assertNotEqual(self.website.published_version, version)
+        html = self.get_home()
+        self.assertIn('Rye on Sundays', html)
+        self.assertNotIn('Fresh bread daily', html)
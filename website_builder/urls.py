@@ -9,9 +9,11 @@ urlpatterns = [
     path('select-type/', views.select_website_type, name='select_type'),
     path('register/<str:website_type>/', views.business_registration, name='register'),
     path('build/<str:website_type>/', views.ai_builder, name='ai_builder'),
+    path('generating/<uuid:job_id>/', views.generation_status, name='generation_status'),
     path('template-preview/<str:website_type>/', views.template_preview, name='template_preview'),
     path('edit/<slug:slug>/', views.website_editor, name='edit'),
     path('preview/<slug:slug>/', views.website_preview, name='preview'),
+    path('preview/<slug:slug>/live/', views.live_preview, name='live_preview'),
     
     # Domain & Publishing
     path('domain/<slug:slug>/', views.domain_setup, name='domain_setup'),
@@ -26,6 +28,14 @@ urlpatterns = [
     path('api/generate-content/', views.generate_ai_content, name='generate_content'),
     path('api/save-website/', views.save_website_changes, name='save_changes'),
     path('api/generate-default-pages/<slug:slug>/', views.generate_default_pages_api, name='generate_default_pages'),
+    path('api/generation/<uuid:job_id>/', views.generation_job, name='generation_job'),
+    path('api/generation/<uuid:job_id>/events/', views.generation_events, name='generation_events'),
+    path('api/save-website/flush/', views.flush_autosave, name='flush_autosave'),
+    path('api/page/<int:page_id>/', views.get_page, name='page'),
+    path('api/page/<int:page_id>/revisions/', views.page_revisions, name='page_revisions'),
+    path('api/page/<int:page_id>/revisions/<int:revision>/', views.page_revision_detail, name='page_revision'),
+    path('api/page/<int:page_id>/revisions/<int:revision>/restore/', views.restore_page_revision, name='restore_page_revision'),
+    path('api/purge/', views.purge_endpoint, name='purge'),
     
     # Payment & Orders
     path('order/domain/<slug:slug>/', views.domain_purchase, name='domain_purchase'),
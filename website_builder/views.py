@@ -1,15 +1,31 @@
-from django.shortcuts import render, redirect, get_object_or_404
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
 from django.contrib.auth import authenticate, login
-from django.http import JsonResponse
-from django.views.decorators.http import require_http_methods
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
+from django.urls import reverse
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_http_methods
 from django.views.decorators.clickjacking import xframe_options_exempt
+from django.views.decorators.csrf import csrf_exempt
+from asgiref.sync import sync_to_async
 from django.contrib import messages
 from django.conf import settings
 from django.utils import timezone
-from .models import WebsiteProject, WebsiteDomain, WebsiteContent, DomainOrder, AIWebsiteTemplate
+from .models import (
+    WebsiteProject, WebsiteDomain, WebsiteContent, WebsiteContentRevision, DomainOrder, AIWebsiteTemplate, GenerationJob,
+)
 from .services import AIContentGenerator, DomainRegistrationService
+from .autosave import AutosaveBusy, buffer_changes, editor_revision, flush_website, overlay_page, overlay_pages
+from .editing import RevisionConflict, publish_saved_changes, restore_revision
+from .history import document_at
+from .jobs import enqueue_generation, expire_if_stale, job_status_data, stream_job_events
+from .jsonpatch import JsonPatchError
+from .publishing import publish_site
+from .preview import apush_saved_changes, push_saved_changes, render_preview_page, saved_changes_events
+from .purging import record_purge, recent_purges
+from .rendering import json_hash
 import json
 
 
@@ -219,28 +235,14 @@ def ai_builder(request, website_type):
             status='draft'
         )
         
-        # Generate AI content
-        try:
-            ai_generator = AIContentGenerator()
-            generated_content = ai_generator.generate_website_structure(
-                website_type=website_type,
-                business_description=business_description,
-                website_name=website_name
-            )
-            
-            website.ai_generated_data = generated_content
-            website.status = 'preview'
-            website.save()
-            
-            # Create default pages
-            create_default_pages(website, generated_content)
-            
-            messages.success(request, f'🎉 Your website "{website_name}" has been generated! Review and customize it below.')
-            return redirect('website_builder:edit', slug=website.slug)
-            
-        except Exception as e:
-            messages.error(request, f'Failed to generate website: {str(e)}')
-            website.delete()  # Clean up failed creation
+        # Generate AI content and pages in the background; the status page polls the job
+        job = enqueue_generation(
+            request.user, website, 'site',
+            website_type=website_type,
+            business_description=business_description,
+            website_name=website_name,
+        )
+        return redirect('website_builder:generation_status', job_id=job.id)
     
     context = {
         'website_type': website_type,
@@ -281,11 +283,15 @@ def website_editor(request, slug):
     User can modify AI-generated content
     """
     website = get_object_or_404(WebsiteProject, slug=slug, user=request.user)
-    pages = website.pages.all()
+    # Only the page index; the editor fetches each page's content from api/page/<id>/
+    pages = overlay_pages(website, website.pages.only(
+        'id', 'website_id', 'page_slug', 'page_title', 'page_type', 'sort_order', 'is_published', 'revision',
+    ))
     
     context = {
         'website': website,
         'pages': pages,
+        'website_pages': pages,
         'editor_config': {
             'website_id': str(website.id),
             'api_base': '/website-builder/api/',
@@ -295,16 +301,32 @@ def website_editor(request, slug):
     return render(request, 'website_builder/editor.html', context)
 
 
+@login_required
+def live_preview(request, slug):
+    """
+    Preview of a page that follows the editor live over a WebSocket
+    ?page=<slug> picks the page; buffered autosaves are included.
+    """
+    website = get_object_or_404(WebsiteProject, slug=slug, user=request.user)
+    pages = overlay_pages(website, website.pages.all())
+    if not pages:
+        return redirect('website_builder:preview', slug=website.slug)
+    
+    requested = request.GET.get('page', 'home')
+    page = next((page for page in pages if page.page_slug == requested), pages[0])
+    return HttpResponse(render_preview_page(website, page, pages))
+
+
 @login_required
 def website_preview(request, slug):
     """
     Preview the website as it would appear live
     """
     website = get_object_or_404(WebsiteProject, slug=slug, user=request.user)
-    pages = website.pages.all()
+    pages = overlay_pages(website, website.pages.all())
     
     # Get homepage or first page
-    homepage = pages.filter(page_type='home').first() or pages.first()
+    homepage = next((page for page in pages if page.page_type == 'home'), None) or next(iter(pages), None)
     
     context = {
         'website': website,
@@ -378,10 +400,16 @@ def publish_website(request, slug):
         return redirect('website_builder:domain_setup', slug=website.slug)
     
     if request.method == 'POST':
+        try:
+            flush_website(website)
+        except RevisionConflict:
+            messages.warning(request, 'Some unsaved edits conflicted with newer changes and were not published.')
+        website.refresh_from_db()
         website.is_published = True
         website.published_at = timezone.now()
         website.status = 'published'
         website.save()
+        publish_site(website)
         
         messages.success(request, f'🚀 Your website is now live at {website.get_live_url()}!')
         return redirect('website_builder:dashboard')
@@ -420,7 +448,7 @@ def my_websites(request):
 
 # API Views
 @require_http_methods(["GET"])
-def check_domain_availability(request):
+async def check_domain_availability(request):
     """
     AJAX API to check if a domain/subdomain is available
     """
@@ -429,14 +457,21 @@ def check_domain_availability(request):
     
     if domain_type == 'subdomain':
         full_domain = f"{domain}.justcodeworks.eu"
-        available = not WebsiteDomain.objects.filter(domain_name=full_domain).exists()
+        candidates = [full_domain] + [f"{domain}{i}.justcodeworks.eu" for i in range(1, 4)]
+        
+        # One query covers the requested name and every suggestion
+        taken = {
+            name async for name in WebsiteDomain.objects.filter(
+                domain_name__in=candidates
+            ).values_list('domain_name', flat=True)
+        }
+        available = full_domain not in taken
         suggested = []
         
         if not available:
             # Generate suggestions
-            for i in range(1, 4):
-                suggestion = f"{domain}{i}.justcodeworks.eu"
-                if not WebsiteDomain.objects.filter(domain_name=suggestion).exists():
+            for suggestion in candidates[1:]:
+                if suggestion not in taken:
                     suggested.append(suggestion.replace('.justcodeworks.eu', ''))
     else:
         # Check external domain availability (requires domain registrar API)
@@ -877,12 +912,18 @@ def generate_ai_content(request):
 
 
 @require_http_methods(["POST"])
-def save_website_changes(request):
+async def save_website_changes(request):
     """
     API endpoint for saving website changes
     Used by AJAX calls from the website editor
+    
+    Each entry of changes.content.pages carries either the full page
+    ({"slug", "content_blocks", "seo_title", "seo_description"}) or an RFC 6902
+    JSON Patch against its current revision ({"slug", "revision", "patch": [...]},
+    applied to WebsiteContent.patch_document()). Stale revisions answer 409.
     """
-    if not request.user.is_authenticated:
+    user = await request.auser()
+    if not user.is_authenticated:
         return JsonResponse({'error': 'Authentication required'}, status=401)
     
     try:
@@ -894,36 +935,29 @@ def save_website_changes(request):
             return JsonResponse({'error': 'Website ID required'}, status=400)
         
         # Get the website project
-        website = get_object_or_404(WebsiteProject, id=website_id, user=request.user)
+        website = await aget_object_or_404(WebsiteProject, id=website_id, user=user)
         
-        # Update website data
-        if 'name' in changes:
-            website.website_name = changes['name']
-        if 'description' in changes:
-            website.business_description = changes['description']
+        # Merge into the autosave buffer (website_builder.autosave), which writes the
+        # project and its pages in one transaction once the burst of edits settles
+        try:
+            result = await sync_to_async(buffer_changes)(website, changes)
+        except AutosaveBusy:
+            return JsonResponse({'error': 'Another save is in progress, please retry'}, status=503)
+        except RevisionConflict as e:
+            return JsonResponse({
+                'error': 'Pages were changed by another save; reload them and retry',
+                'conflicts': e.conflicts,
+            }, status=409)
+        except JsonPatchError as e:
+            return JsonResponse({'error': f'Invalid patch: {e}'}, status=400)
         
-        website.save()
-        
-        # Update content if provided
-        if 'content' in changes:
-            content_data = changes['content']
-            for page_data in content_data.get('pages', []):
-                content, created = WebsiteContent.objects.get_or_create(
-                    website=website,
-                    page_slug=page_data.get('slug', 'home'),
-                    defaults={
-                        'page_type': page_data.get('type', 'custom'),
-                        'page_title': page_data.get('title', 'Untitled'),
-                    }
-                )
-                content.content_blocks = page_data.get('content_blocks', [])
-                content.seo_title = page_data.get('seo_title', '')
-                content.seo_description = page_data.get('seo_description', '')
-                content.save()
+        events = await sync_to_async(saved_changes_events)(result)
+        await apush_saved_changes(website.id, events)
         
         return JsonResponse({
             'success': True,
-            'message': 'Website updated successfully'
+            'message': 'Website updated successfully',
+            **result.as_dict(),
         })
         
     except json.JSONDecodeError:
@@ -932,6 +966,176 @@ def save_website_changes(request):
         return JsonResponse({'error': str(e)}, status=500)
 
 
+# Page API field -> WebsiteContent field
+PAGE_API_FIELDS = {
+    'id': 'id',
+    'slug': 'page_slug',
+    'title': 'page_title',
+    'type': 'page_type',
+    'content_blocks': 'content_blocks',
+    'seo_title': 'seo_title',
+    'seo_description': 'seo_description',
+    'seo_keywords': 'seo_keywords',
+    'is_published': 'is_published',
+    'sort_order': 'sort_order',
+    'revision': 'revision',
+    'updated_at': 'updated_at',
+}
+
+
+def page_etag(request, page_id):
+    """ETag of a page API response, from the page's revision without loading its content"""
+    row = (
+        WebsiteContent.objects.filter(id=page_id, website__user=request.user)
+        .values_list('website_id', 'page_slug', 'revision', 'updated_at').first()
+    )
+    if row is None:
+        return None
+    website_id, slug, revision, updated_at = row
+    return json_hash([editor_revision(website_id, slug, revision), updated_at, request.GET.get('fields', '')])
+
+
+@login_required
+@require_http_methods(["GET"])
+@cache_control(private=True, no_cache=True)
+@condition(etag_func=page_etag)
+def get_page(request, page_id):
+    """
+    API endpoint returning one page for the website editor
+    ?fields=title,content_blocks limits the response to those fields (see
+    PAGE_API_FIELDS). Responses carry an ETag; If-None-Match answers 304.
+    Buffered autosaves are included.
+    """
+    requested = request.GET.get('fields')
+    fields = [name.strip() for name in requested.split(',') if name.strip()] if requested else list(PAGE_API_FIELDS)
+    unknown = [name for name in fields if name not in PAGE_API_FIELDS]
+    if unknown:
+        return JsonResponse({'error': f"Unknown fields: {', '.join(unknown)}"}, status=400)
+    
+    columns = {PAGE_API_FIELDS[name] for name in fields} | {'website_id', 'page_slug', 'revision'}
+    page = get_object_or_404(
+        WebsiteContent.objects.only(*columns), id=page_id, website__user=request.user
+    )
+    overlay_page(page)
+    
+    return JsonResponse({
+        'success': True,
+        'page': {name: getattr(page, PAGE_API_FIELDS[name]) for name in fields},
+    })
+
+
+@login_required
+@require_http_methods(["POST"])
+def flush_autosave(request):
+    """
+    API endpoint writing the editor's buffered changes to the database
+    Sent with navigator.sendBeacon when the editor page is closed (form-encoded)
+    """
+    website = get_object_or_404(WebsiteProject, id=request.POST.get('website_id'), user=request.user)
+    try:
+        result = flush_website(website)
+    except AutosaveBusy:
+        return JsonResponse({'error': 'Another save is in progress, please retry'}, status=503)
+    except RevisionConflict as e:
+        return JsonResponse({
+            'error': 'Pages were changed by another save; reload them and retry',
+            'conflicts': e.conflicts,
+        }, status=409)
+    return JsonResponse({'success': True, 'flushed': result is not None})
+
+
+@login_required
+@require_http_methods(["GET"])
+def page_revisions(request, page_id):
+    """
+    API endpoint listing the stored revisions of a page, newest first
+    """
+    page = get_object_or_404(WebsiteContent, id=page_id, website__user=request.user)
+    revisions = WebsiteContentRevision.objects.filter(page=page).values(
+        'revision', 'is_snapshot', 'size', 'created_at'
+    )
+    return JsonResponse({
+        'page_id': page.id,
+        'current_revision': page.revision,
+        'revisions': list(revisions),
+    })
+
+
+@login_required
+@require_http_methods(["GET"])
+def page_revision_detail(request, page_id, revision):
+    """
+    API endpoint returning a page document as of a stored revision
+    """
+    page = get_object_or_404(WebsiteContent, id=page_id, website__user=request.user)
+    document = document_at(page.id, revision)
+    if document is None:
+        return JsonResponse({'error': 'Revision not found'}, status=404)
+    return JsonResponse({'page_id': page.id, 'revision': revision, 'document': document})
+
+
+@login_required
+@require_http_methods(["POST"])
+def restore_page_revision(request, page_id, revision):
+    """
+    API endpoint restoring a past revision as the page's new current content (undo)
+    """
+    page = get_object_or_404(WebsiteContent.objects.select_related('website'), id=page_id, website__user=request.user)
+    # Restoring writes directly, so buffered autosaves must land first
+    try:
+        flush_website(page.website)
+    except RevisionConflict:
+        # The conflicting autosaves were dropped; the restore replaces the page anyway
+        pass
+    page.refresh_from_db(fields=['revision'])
+    document = document_at(page.id, revision)
+    if document is None:
+        return JsonResponse({'error': 'Revision not found'}, status=404)
+    
+    try:
+        result = restore_revision(page, document)
+    except RevisionConflict as e:
+        return JsonResponse({
+            'error': 'Page was changed by another save; reload it and retry',
+            'conflicts': e.conflicts,
+        }, status=409)
+    publish_saved_changes(page.website_id, result)
+    push_saved_changes(page.website_id, result)
+    
+    return JsonResponse({
+        'success': True,
+        'restored_revision': revision,
+        **result.as_dict(),
+    })
+
+
+@csrf_exempt
+@require_http_methods(["GET", "POST"])
+def purge_endpoint(request):
+    """
+    Local stand-in for the edge cache purge API
+    Point SITE_PURGE_URL here in development and tests; GET lists recent purges
+    """
+    token = getattr(settings, 'SITE_PURGE_TOKEN', None)
+    if not token and not settings.DEBUG:
+        return JsonResponse({'error': 'Not found'}, status=404)
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return JsonResponse({'error': 'Invalid purge token'}, status=403)
+    
+    if request.method == 'GET':
+        return JsonResponse({'purges': recent_purges()})
+    
+    try:
+        keys = json.loads(request.body).get('keys', [])
+    except (json.JSONDecodeError, AttributeError):
+        return JsonResponse({'error': 'Invalid JSON data'}, status=400)
+    if not isinstance(keys, list) or not all(isinstance(key, str) for key in keys):
+        return JsonResponse({'error': 'keys must be a list of strings'}, status=400)
+    
+    record_purge(keys)
+    return JsonResponse({'success': True, 'purged': keys})
+
+
 @login_required
 def domain_purchase(request, slug):
     """
@@ -1007,30 +1211,68 @@ def generate_default_pages_api(request, slug):
     """
     website = get_object_or_404(WebsiteProject, slug=slug, user=request.user)
     
+    job = enqueue_generation(request.user, website, 'pages', website_name=website.name)
+    return JsonResponse({
+        'success': True,
+        'job_id': str(job.id),
+        'status_url': reverse('website_builder:generation_job', kwargs={'job_id': job.id}),
+    }, status=202)
+
+
+@login_required
+def generation_status(request, job_id):
+    """
+    Waiting page shown while a website is generated in the background
+    """
+    job = get_object_or_404(GenerationJob.objects.select_related('website'), id=job_id, user=request.user)
+    job = expire_if_stale(job)
+    if job.status == 'succeeded' and job.website_id:
+        messages.success(request, f'🎉 Your website "{job.website.name}" has been generated! Review and customize it below.')
+        return redirect('website_builder:edit', slug=job.website.slug)
+    
+    context = {
+        'job': job,
+        'website_type': job.payload.get('website_type'),
+    }
+    return render(request, 'website_builder/generation_status.html', context)
+
+
+@login_required
+@require_http_methods(["GET"])
+def generation_job(request, job_id):
+    """
+    API endpoint polled for the status of a generation job
+    """
+    job = get_object_or_404(GenerationJob.objects.select_related('website'), id=job_id, user=request.user)
+    job = expire_if_stale(job)
+    response = JsonResponse({'success': True, 'job': job_status_data(job)})
+    response['Cache-Control'] = 'no-store'
+    return response
+
+
+@require_http_methods(["GET"])
+async def generation_events(request, job_id):
+    """
+    Server-Sent Events stream of a generation job
+    Sends each field, page and rendered block as the model writes it, then a final
+    'status' event; reconnecting browsers resume after their Last-Event-ID.
+    Only served under ASGI: WSGI would read the whole stream into a blocked worker
+    before sending it, so there the client is told to stop (204) and polls instead.
+    """
+    if not isinstance(request, ASGIRequest):
+        return HttpResponse(status=204)
+    
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({'error': 'Authentication required'}, status=401)
+    
+    job = await aget_object_or_404(GenerationJob, id=job_id, user=user)
     try:
-        # Generate AI content based on website details
-        business_details = {
-            'business_name': website.name,
-            'website_type': website.website_type,
-        }
-        
-        ai_generator = AIContentGenerator()
-        generated_content = ai_generator.generate_website_structure(
-            website_type=website.website_type,
-            business_description=f"A {website.get_website_type_display()} website",
-            website_name=website.name
-        )
-        
-        # Create default pages using existing function
-        create_default_pages(website, generated_content)
-        
-        return JsonResponse({
-            'success': True,
-            'message': 'Default pages generated successfully'
-        })
-        
-    except Exception as e:
-        return JsonResponse({
-            'success': False,
-            'error': str(e)
-        })
\ No newline at end of file
+        start = int(request.headers.get('Last-Event-ID', -1)) + 1
+    except ValueError:
+        start = 0
+    
+    response = StreamingHttpResponse(stream_job_events(job.id, max(start, 0)), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'  # Don't let nginx buffer the stream
+    return response